@@ -0,0 +1,52 @@
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# =============================================================================
+# Import / Startup Benchmark
+# =============================================================================
+# Compares, in fresh interpreters, importing the core package with starting
+# the Streamlit script through the headless AppTest harness.
+#
+# Usage: python benchmarks/bench_import.py
+
+RUNS = 5
+
+SNIPPETS = (
+    ("import radiology_guide", "import radiology_guide"),
+    ("render one topic guide",
+     "import radiology_guide; radiology_guide.get_topic_guide('By Section', 'Anatomy')"),
+    ("render one lesion guide",
+     "import radiology_guide; radiology_guide.get_complete_lesion_guide("
+     "'CT', 'Brain', 'Mass', '2', 'Infiltrative', 'Irregular', 'Necrotic', 'None', 'High', 'Mixed', "
+     "'Ring-enhancing', '')"),
+    ("start streamlite12_app.py",
+     "from streamlit.testing.v1 import AppTest; "
+     f"AppTest.from_file({os.path.join(ROOT, 'streamlite12_app.py')!r}, default_timeout=60).run()"),
+)
+
+def time_snippet(code):
+    env = dict(os.environ, RADIOLOGY_GUIDE_OFFLINE="1")
+    samples = []
+    for _ in range(RUNS):
+        timed = f"import time; _start = time.perf_counter(); {code}; print(time.perf_counter() - _start)"
+        output = subprocess.check_output([sys.executable, "-c", timed], cwd=ROOT, env=env,
+                                         stderr=subprocess.DEVNULL)
+        samples.append(float(output.split()[-1]))
+    return statistics.median(samples)
+
+
+def main():
+    print(f"{'':<28} {'median (ms)':>12}")
+    for name, code in SNIPPETS:
+        try:
+            print(f"{name:<28} {time_snippet(code) * 1000:>12.1f}")
+        except subprocess.CalledProcessError:
+            print(f"{name:<28} {'failed':>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from radiology_guide.kb import KnowledgeBase, build, write_store
+
+# =============================================================================
+# Knowledge Base Benchmark
+# =============================================================================
+# Builds a synthetic store of the given size and starts several worker
+# processes that each look up every record once, either through the
+# memory-mapped store or from the same content loaded into a dict of strings
+# (the per-process literals of the bundled content). Reports the private
+# memory each worker ends up holding and the lookup latency of the store.
+#
+# It then measures the app path on synthetic rules files of each given size:
+# each worker loads the search index with default_index(), renders every
+# topic guide and a sample of lesion guides and runs a few searches, once
+# with the content loaded from the rules file and once from a knowledge base
+# built from it. With a knowledge base the growth per worker should stay flat
+# as the content grows. Private memory is read from /proc/self/smaps_rollup,
+# so this is Linux-only.
+#
+# Usage: python benchmarks/bench_kb.py [--megabytes 128] [--app-megabytes 4 16 64] [--workers 4]
+
+RECORD_BYTES = 2048
+LESION_RENDERS = 200
+QUERIES = ("w17 w42", "w100", "rule", "anatomy")
+
+PRIVATE_KIB = r"""
+def private_kib():
+    total = 0
+    with open("/proc/self/smaps_rollup") as handle:
+        for line in handle:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                total += int(line.split()[1])
+    return total
+"""
+
+WORKER = PRIVATE_KIB + r"""
+import sys
+root, path, count, mode = sys.argv[1], sys.argv[2], int(sys.argv[3]), sys.argv[4]
+sys.path.insert(0, root)
+from radiology_guide.kb import KnowledgeBase
+
+before = private_kib()
+store = KnowledgeBase(path)
+if mode == "dict":
+    content = {("record", str(number)): store.get(("record", str(number))) for number in range(count)}
+    touched = sum(len(content[("record", str(number))]) for number in range(count))
+else:
+    touched = sum(len(store.view(("record", str(number)))) for number in range(count))
+print(private_kib() - before, touched)
+"""
+
+APP_WORKER = PRIVATE_KIB + r"""
+import itertools
+import os
+import sys
+root, path, mode, renders, queries = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4]), sys.argv[5:]
+if mode == "kb":
+    os.environ["RADIOLOGY_GUIDE_KB"] = path
+sys.path.insert(0, root)
+
+before = private_kib()
+from radiology_guide import options, rules, search
+from radiology_guide.guides import get_complete_lesion_guide, get_topic_guide
+
+if mode == "rules":
+    rules.default_engine.value = rules.load_rules(path)
+index = search.default_index()
+touched = 0
+for topic_mode, (_, selections) in options.TOPIC_OPTIONS.items():
+    touched += sum(len(get_topic_guide(topic_mode, selection)) for selection in selections)
+engine = rules.default_engine()
+for rule in itertools.islice(engine.rules, 0, None, max(1, len(engine.rules) // renders)):
+    touched += len(get_complete_lesion_guide(*rule.key, "", "", "", "", "", "", "", "", ""))
+for query in queries:
+    touched += sum(len(result.text) for result in index.search(query))
+print(private_kib() - before, touched)
+"""
+
+
+def worker_private_kib(path, count, mode, workers):
+    command = [sys.executable, "-c", WORKER, ROOT, path, str(count), mode]
+    processes = [subprocess.Popen(command, stdout=subprocess.PIPE) for _ in range(workers)]
+    return [int(process.communicate()[0].split()[0]) for process in processes]
+
+
+def app_private_kib(path, mode, workers):
+    command = [sys.executable, "-c", APP_WORKER, ROOT, path, mode, str(LESION_RENDERS), *QUERIES]
+    env = dict(os.environ, RADIOLOGY_GUIDE_OFFLINE="1")
+    env.pop("RADIOLOGY_GUIDE_KB", None)
+    env.pop("RADIOLOGY_GUIDE_SEARCH_INDEX", None)
+    processes = [subprocess.Popen(command, stdout=subprocess.PIPE, env=env) for _ in range(workers)]
+    return [int(process.communicate()[0].split()[0]) for process in processes]
+
+
+def synthetic_rules(count, rng):
+    words = [f"w{number}" for number in range(5000)]
+    rules = []
+    for number in range(count):
+        note = " ".join(rng.choice(words) for _ in range(RECORD_BYTES // 5))
+        rules.append({
+            "id": f"rule-{number}",
+            "modality": f"M{number % 7}",
+            "organ": f"O{number // 7 % 97}",
+            "lesion_type": f"L{number // 679}",
+            "title": f"Rule {number}",
+            "notes": [note],
+        })
+    return rules
+
+
+def print_sizes(label, sizes):
+    print(f"{label:<18} {', '.join(f'{size / 1024:.1f}' for size in sizes)} MiB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the memory-mapped knowledge base.")
+    parser.add_argument("--megabytes", type=int, default=128, help="size of the synthetic content")
+    parser.add_argument("--app-megabytes", type=int, nargs="+", default=[4, 16, 64],
+                        help="sizes of the synthetic lesion rules for the app path")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    count = args.megabytes * 1024 * 1024 // RECORD_BYTES
+    text = ("lorem ipsum dolor sit amet " * (RECORD_BYTES // 27 + 1))[:RECORD_BYTES]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.kb")
+        start = time.perf_counter()
+        write_store(path, ((("record", str(number)), text) for number in range(count)))
+        print(f"Built {count} records ({os.path.getsize(path) / 2 ** 20:.0f} MiB) "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        store = KnowledgeBase(path)
+        keys = [("record", str(random.randrange(count))) for _ in range(100000)]
+        for name, lookup in (("view (zero-copy)", store.view), ("get (decoded)", store.get)):
+            start = time.perf_counter()
+            for key in keys:
+                lookup(key)
+            print(f"{name:<18} {(time.perf_counter() - start) / len(keys) * 1e6:6.2f} us per lookup")
+        store.close()
+
+        print(f"\nPrivate memory per worker after touching every record ({args.workers} workers):")
+        for mode, label in (("mmap", "memory-mapped"), ("dict", "dict of strings")):
+            print_sizes(label, worker_private_kib(path, count, mode, args.workers))
+
+        for megabytes in args.app_megabytes:
+            rules_path = os.path.join(directory, f"rules-{megabytes}.json")
+            with open(rules_path, "w", encoding="utf-8") as handle:
+                json.dump(synthetic_rules(megabytes * 1024 * 1024 // RECORD_BYTES, random.Random(0)), handle)
+            app_path = os.path.join(directory, f"app-{megabytes}.kb")
+            start = time.perf_counter()
+            records = build(app_path, rules_path)
+            print(f"\nApp path, {records} records ({os.path.getsize(app_path) / 2 ** 20:.0f} MiB, built in "
+                  f"{time.perf_counter() - start:.1f}s): private memory per worker after default_index(), "
+                  f"rendering and searching ({args.workers} workers):")
+            for mode, path, label in (("kb", app_path, "knowledge base"), ("rules", rules_path, "rules file")):
+                print_sizes(label, app_private_kib(path, mode, args.workers))
+
+
+if __name__ == "__main__":
+    main()
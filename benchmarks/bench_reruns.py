@@ -0,0 +1,134 @@
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("RADIOLOGY_GUIDE_OFFLINE", "1")
+
+from streamlit.testing.v1 import AppTest
+
+# =============================================================================
+# Rerun Benchmark
+# =============================================================================
+# Replays a scripted editing session against the app under Streamlit's
+# headless AppTest harness and reports how many reruns it causes and how much
+# CPU they cost, for two event streams:
+#
+#   per-commit  every free-text field and the search box rerun the whole
+#               script each time they commit (the previous layout)
+#   fragments   free-text fields are buffered in a form and applied once;
+#               a search only reruns the search fragment
+#
+# Streamlit does not rerun on keystrokes: a text_input commits on Enter or
+# blur and a text_area on blur or Ctrl+Enter, so both streams count one
+# commit per field edit and one per submitted search. Both run against the
+# current code, so the difference is the rerun scheduling alone, not
+# caching. AppTest cannot trigger a fragment-scoped rerun, so the search
+# fragment is timed on its own script. The output panes are not fragments:
+# their inputs are sidebar widgets, so a change to them reruns the whole
+# script in both streams.
+#
+# Usage: python benchmarks/bench_reruns.py
+
+APP = os.path.join(ROOT, "streamlite12_app.py")
+
+# (kind, widget key, value)
+EDITING_SESSION = (
+    ("select", "modality", "CT"),
+    ("select", "organ", "Brain"),
+    ("type", "lesion_size", "3.2"),
+    ("select", "lesion_margin", "Infiltrative"),
+    ("select", "lesion_internal", "Necrotic"),
+    ("type", "additional_features", "diffusion restriction, edema"),
+    ("select", "lesion_enhancement", "Ring-enhancing"),
+    ("submit", None, None),
+    ("select", "guide_mode", "Radiology Topics"),
+    ("search", None, "ring enhancing abscess"),
+)
+
+
+def search_fragment_script():
+    import streamlite12_app
+
+    streamlite12_app.topic_search()
+
+
+def timed_run(at):
+    start = time.process_time()
+    at.run()
+    return time.process_time() - start
+
+
+def text_widget(at, key):
+    return at.text_input(key=key) if key == "lesion_size" else at.text_area(key=key)
+
+
+def set_widget(at, key, value):
+    widget = at.radio(key=key) if key == "guide_mode" else at.selectbox(key=key)
+    widget.set_value(value)
+
+
+def per_commit():
+    at = AppTest.from_file(APP, default_timeout=60)
+    cpu = timed_run(at)
+    reruns = 1
+    for kind, key, value in EDITING_SESSION:
+        if kind == "select":
+            set_widget(at, key, value)
+            cpu += timed_run(at)
+            reruns += 1
+        elif kind == "type":
+            # The fields now sit in a form, so the commit is replayed as an
+            # edit plus its submit.
+            text_widget(at, key).input(value)
+            at.button[0].click()
+            cpu += timed_run(at)
+            reruns += 1
+        elif kind == "search":
+            at.text_input[0].input(value)
+            cpu += timed_run(at)
+            reruns += 1
+    return reruns, 0, cpu
+
+
+def fragments():
+    at = AppTest.from_file(APP, default_timeout=60)
+    cpu = timed_run(at)
+    reruns = 1
+    fragment_reruns = 0
+    for kind, key, value in EDITING_SESSION:
+        if kind == "select":
+            set_widget(at, key, value)
+            cpu += timed_run(at)
+            reruns += 1
+        elif kind == "type":
+            # Buffered in the form; no rerun until it is submitted.
+            text_widget(at, key).input(value)
+        elif kind == "submit":
+            at.button[0].click()
+            cpu += timed_run(at)
+            reruns += 1
+        elif kind == "search":
+            fragment = AppTest.from_function(search_fragment_script, default_timeout=60)
+            timed_run(fragment)
+            fragment.text_input[0].input(value)
+            cpu += timed_run(fragment)
+            fragment_reruns += 1
+    return reruns, fragment_reruns, cpu
+
+
+def main():
+    # Imports and the shared caches are warmed first so neither stream pays them.
+    fragments()
+    results = [("per-commit", per_commit()), ("fragments", fragments())]
+    print(f"{'event stream':<15} {'full reruns':>12} {'fragment reruns':>16} {'CPU (ms)':>10}")
+    for name, (reruns, fragment_reruns, cpu) in results:
+        print(f"{name:<15} {reruns:>12} {fragment_reruns:>16} {cpu * 1000:>10.1f}")
+    baseline, optimized = results[0][1], results[1][1]
+    print(f"\nFull reruns saved: {baseline[0] - optimized[0]} of {baseline[0]}; "
+          f"CPU saved per session: {1 - optimized[2] / baseline[2]:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from radiology_guide.rules import CHARACTERISTICS, RuleEngine
+
+# =============================================================================
+# Rule Engine Lookup Benchmark
+# =============================================================================
+# Builds synthetic rule sets of increasing size and times resolve() on random
+# queries. With the hash index the per-lookup cost should stay flat from 10 to
+# 100k rules; a linear if/elif chain would grow with the rule count.
+#
+# Usage: python benchmarks/bench_rule_engine.py
+
+RULE_COUNTS = (10, 100, 1000, 10000, 100000)
+RULES_PER_KEY = 4
+QUERIES = 20000
+VALUES = ("a", "b", "c", "d", "e")
+
+
+def synthetic_rules(count, rng):
+    rules = []
+    for i in range(count):
+        key = i // RULES_PER_KEY
+        spec = {
+            "id": f"rule-{i}",
+            "modality": f"M{key % 7}",
+            "organ": f"O{key // 7 % 97}",
+            "lesion_type": f"L{key // 679}",
+            "title": f"Rule {i}",
+            "notes": [f"Synthetic rule {i}."],
+        }
+        if i % RULES_PER_KEY:
+            spec["when"] = {rng.choice(CHARACTERISTICS): rng.sample(VALUES, 2)}
+        rules.append(spec)
+    rules.append({"id": "general", "title": "General Lesion Analysis"})
+    return rules
+
+
+def time_lookups(engine, queries):
+    start = time.perf_counter()
+    for modality, organ, lesion_type, characteristics in queries:
+        engine.resolve(modality, organ, lesion_type, **characteristics)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'rules':>10} {'compile (ms)':>12} {'lookup (us)':>14}")
+    for count in RULE_COUNTS:
+        specs = synthetic_rules(count, rng)
+        start = time.perf_counter()
+        engine = RuleEngine(specs)
+        compile_ms = (time.perf_counter() - start) * 1000
+        sample = [rng.choice(specs) for _ in range(QUERIES)]
+        queries = [
+            (spec.get("modality", "M0"), spec.get("organ", "O0"), spec.get("lesion_type", "L0"),
+             {name: rng.choice(VALUES) for name in CHARACTERISTICS})
+            for spec in sample
+        ]
+        print(f"{count:>10} {compile_ms:>12.1f} {time_lookups(engine, queries) * 1e6:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from radiology_guide.scoring import DifferentialScorer
+
+# =============================================================================
+# Differential Scoring Benchmark
+# =============================================================================
+# Times ranking a single case and a batch of cases against synthetic weight
+# matrices of increasing size.
+#
+# Usage: python benchmarks/bench_scoring.py
+
+DIAGNOSIS_COUNTS = (100, 1000, 10000, 50000)
+ORGANS = [f"Organ{i}" for i in range(20)]
+FIELDS = {
+    "margin": 5, "shape": 4, "internal": 5, "calcification": 6,
+    "vascularity": 5, "signal": 8, "enhancement": 8,
+}
+QUERIES = 2000
+BATCH = 1000
+
+
+def synthetic_diagnoses(count, rng):
+    features = [f"{field}:v{value}" for field, size in FIELDS.items() for value in range(size)]
+    return [
+        {
+            "name": f"Diagnosis {i}",
+            "organs": rng.sample(ORGANS, 2),
+            "lesion_types": ["Mass"],
+            "features": {feature: rng.uniform(-1, 3) for feature in rng.sample(features, 8)},
+        }
+        for i in range(count)
+    ]
+
+
+def synthetic_case(rng):
+    case = {field: f"v{rng.randrange(size)}" for field, size in FIELDS.items()}
+    case.update(organ=rng.choice(ORGANS), lesion_type="Mass")
+    return case
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'diagnoses':>10} {'rank (us)':>14} {'batch (us/case)':>18}")
+    for count in DIAGNOSIS_COUNTS:
+        scorer = DifferentialScorer(synthetic_diagnoses(count, rng))
+        cases = [synthetic_case(rng) for _ in range(QUERIES)]
+        start = time.perf_counter()
+        for case in cases:
+            scorer.rank(case, 5)
+        single = (time.perf_counter() - start) / len(cases)
+        start = time.perf_counter()
+        scorer.score_batch(cases[:BATCH])
+        batch = (time.perf_counter() - start) / BATCH
+        print(f"{count:>10} {single * 1e6:>14.1f} {batch * 1e6:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
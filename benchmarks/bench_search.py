@@ -0,0 +1,50 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from radiology_guide.search import Document, SearchIndex, guide_documents
+
+# =============================================================================
+# Search Index Benchmark
+# =============================================================================
+# Pads the real guide corpus with synthetic documents built from its own
+# vocabulary and times exact, prefix and misspelled queries.
+#
+# Usage: python benchmarks/bench_search.py
+
+DOCUMENT_COUNTS = (1000, 10000, 50000)
+WORDS_PER_DOCUMENT = 80
+QUERIES = ("ring-enhancing", "TI-RADS", "thyroid nodule", "embol", "glioblastma", "calcification popcorn")
+
+
+def synthetic_corpus(count, rng):
+    documents = list(guide_documents())
+    words = sorted({word for document in documents for word in document.text.split()})
+    while len(documents) < count:
+        text = " ".join(rng.choice(words) for _ in range(WORDS_PER_DOCUMENT))
+        documents.append(Document(("synthetic", len(documents)), f"Synthetic {len(documents)}", text))
+    return documents
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'documents':>10} {'build (s)':>12} {'  '.join(f'{query[:14]:>14}' for query in QUERIES)}")
+    for count in DOCUMENT_COUNTS:
+        documents = synthetic_corpus(count, rng)
+        start = time.perf_counter()
+        index = SearchIndex(documents, loader={document.key: document for document in documents}.get)
+        build = time.perf_counter() - start
+        timings = []
+        for query in QUERIES:
+            start = time.perf_counter()
+            for _ in range(20):
+                index.search(query)
+            timings.append((time.perf_counter() - start) / 20 * 1000)
+        print(f"{count:>10} {build:>12.2f} {'  '.join(f'{timing:12.2f}ms' for timing in timings)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("RADIOLOGY_GUIDE_OFFLINE", "1")
+
+from radiology_guide import options
+from radiology_guide.guides import get_complete_lesion_guide, get_topic_guide
+
+# =============================================================================
+# Benchmark Suite
+# =============================================================================
+# Times guide generation over the sidebar option combinations and complete
+# script reruns of streamlite12_app.py under Streamlit's headless AppTest
+# harness. Each benchmark reports p50/p95/p99 latency and the peak traced
+# memory of a separate pass; results are written as JSON and compared with a
+# stored baseline. Everything runs offline.
+#
+#   python benchmarks/run_suite.py                       run and compare
+#   python benchmarks/run_suite.py --update-baseline     record a new baseline
+#   python benchmarks/run_suite.py --threshold 0.1       fail on >10% slowdowns
+#
+# The lesion combinations are every (modality, organ, lesion_type) the sidebar
+# offers, crossed with each value of each characteristic varied one at a time
+# from the sidebar defaults; the full cartesian product of the characteristics
+# would be tens of millions of guides.
+
+APP = os.path.join(ROOT, "streamlite12_app.py")
+DEFAULT_OUTPUT = os.path.join(ROOT, "bench_output.json")
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+CHARACTERISTIC_ARGUMENTS = (
+    ("margin", options.MARGIN_OPTIONS),
+    ("shape", options.SHAPE_OPTIONS),
+    ("internal", options.INTERNAL_OPTIONS),
+    ("calcification", options.CALCIFICATION_OPTIONS),
+    ("vascularity", options.VASCULARITY_OPTIONS),
+    ("signal", options.SIGNAL_OPTIONS),
+    ("enhancement", options.ENHANCEMENT_OPTIONS),
+)
+
+RERUNS = 60
+# Cached lookups are timed over a warm working set that fits in the cache.
+CACHED_WORKING_SET = 1000
+
+# Metrics that fail the comparison when they grow past the threshold; the
+# tail percentiles are reported but too noisy at this scale to gate on.
+GATED_METRICS = ("p50_us", "peak_kib")
+REPORTED_METRICS = ("p50_us", "p95_us", "p99_us", "peak_kib")
+
+
+def lesion_combinations():
+    defaults = [values[0] for _, values in CHARACTERISTIC_ARGUMENTS]
+    variants = [tuple(defaults)]
+    for position, (_, values) in enumerate(CHARACTERISTIC_ARGUMENTS):
+        for value in values[1:]:
+            variant = list(defaults)
+            variant[position] = value
+            variants.append(tuple(variant))
+    for modality, organ, lesion_type in options.lesion_keys():
+        for variant in variants:
+            yield ((modality, organ, lesion_type, options.DEFAULT_LESION_SIZE) + variant
+                   + (options.DEFAULT_ADDITIONAL_FEATURES,))
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def measure(name, calls, repeat=1):
+    # `calls` is a list of zero-argument callables timed one by one. A second,
+    # traced pass measures peak memory without skewing the timings.
+    samples = []
+    for _ in range(repeat):
+        for call in calls:
+            start = time.perf_counter()
+            call()
+            samples.append(time.perf_counter() - start)
+    tracemalloc.start()
+    for call in calls:
+        call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return name, {
+        "n": len(samples),
+        "mean_us": sum(samples) / len(samples) * 1e6,
+        "p50_us": percentile(samples, 0.50) * 1e6,
+        "p95_us": percentile(samples, 0.95) * 1e6,
+        "p99_us": percentile(samples, 0.99) * 1e6,
+        "peak_kib": peak / 1024,
+    }
+
+
+def guide_benchmarks():
+    lesion_args = list(lesion_combinations())
+    topic_args = list(options.topic_keys())
+    # __wrapped__ bypasses the render cache, so these time the rendering itself.
+    render_lesion = get_complete_lesion_guide.__wrapped__
+    render_topic = get_topic_guide.__wrapped__
+    render_lesion(*lesion_args[0])
+    yield measure("lesion_guide_render", [lambda args=args: render_lesion(*args) for args in lesion_args])
+    working_set = lesion_args[::max(1, len(lesion_args) // CACHED_WORKING_SET)][:CACHED_WORKING_SET]
+    for args in working_set:
+        get_complete_lesion_guide(*args)
+    yield measure("lesion_guide_cached", [lambda args=args: get_complete_lesion_guide(*args) for args in working_set],
+                  repeat=5)
+    yield measure("topic_guide_render", [lambda args=args: render_topic(*args) for args in topic_args], repeat=20)
+    yield measure("topic_guide_cached", [lambda args=args: get_topic_guide(*args) for args in topic_args], repeat=20)
+
+
+def rerun_benchmarks():
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.run()
+    modalities = options.MODALITY_OPTIONS
+    margins = options.MARGIN_OPTIONS
+
+    def lesion_rerun(step):
+        def call():
+            at.selectbox(key="modality").set_value(modalities[step % len(modalities)])
+            at.selectbox(key="lesion_margin").set_value(margins[step % len(margins)])
+            at.run()
+        return call
+
+    yield measure("app_rerun_lesion", [lesion_rerun(step) for step in range(RERUNS)])
+
+    at.radio(key="guide_mode").set_value("Radiology Topics").run()
+    topics = list(options.topic_keys())
+
+    def topic_rerun(step):
+        def call():
+            topic_mode, selection = topics[step % len(topics)]
+            at.radio(key="topic_mode").set_value(topic_mode).run()
+            at.selectbox(key="topic_selection_" + topic_mode).set_value(selection)
+            at.run()
+        return call
+
+    yield measure("app_rerun_topics", [topic_rerun(step) for step in range(RERUNS)])
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"  {name:<24} new")
+            continue
+        changes = []
+        for metric in REPORTED_METRICS:
+            ratio = current[metric] / previous[metric] if previous[metric] else 1.0
+            changes.append(f"{metric.split('_')[0]} {ratio - 1:+.0%}")
+            if metric in GATED_METRICS and ratio > 1 + threshold:
+                regressions.append((name, metric, previous[metric], current[metric]))
+        print(f"  {name:<24} {', '.join(changes)}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark guide generation and full-script reruns.")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="where to write the JSON results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="relative growth of p50 latency or peak memory that counts as a regression")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--skip-reruns", action="store_true", help="only time the guide functions")
+    args = parser.parse_args(argv)
+
+    results = {}
+    suites = [guide_benchmarks()] + ([] if args.skip_reruns else [rerun_benchmarks()])
+    print(f"{'benchmark':<24} {'n':>8} {'p50 (us)':>10} {'p95 (us)':>10} {'p99 (us)':>10} {'peak KiB':>10}")
+    for suite in suites:
+        for name, stats in suite:
+            results[name] = stats
+            print(f"{name:<24} {stats['n']:>8} {stats['p50_us']:>10.1f} {stats['p95_us']:>10.1f} "
+                  f"{stats['p99_us']:>10.1f} {stats['peak_kib']:>10.1f}")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to record one.")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as handle:
+        baseline = json.load(handle)["results"]
+    print(f"\nCompared with {args.baseline} (threshold {args.threshold:.0%}):")
+    regressions = compare(results, baseline, args.threshold)
+    for name, metric, previous, current in regressions:
+        print(f"REGRESSION {name} {metric}: {previous:.1f} -> {current:.1f}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+# Streamlit-free core of the Radiology Pocket Guide. The app in
+# streamlite12_app.py and the batch command line both render through these.
+from radiology_guide.guides import get_complete_lesion_guide, get_topic_guide
+
+__all__ = ["get_complete_lesion_guide", "get_topic_guide"]
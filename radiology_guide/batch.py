@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from radiology_guide.guides import get_complete_lesion_guide, get_topic_guide
+
+# =============================================================================
+# Headless Batch Mode
+# =============================================================================
+# Renders guides for a CSV/Parquet file of cases without Streamlit:
+#
+#   python -m radiology_guide.batch lesions cases.csv -o guides.jsonl
+#   python -m radiology_guide.batch topics topics.parquet -o guides.md
+#
+# The input is read in chunks and split into small batches that are rendered
+# across a process pool. Only a fixed number of batches is in flight at once
+# and results are written in input order as they complete, so memory stays
+# bounded whatever the size of the input.
+
+# Input columns, in the argument order of the guide functions.
+LESION_COLUMNS = (
+    "modality", "organ", "lesion_type", "lesion_size", "lesion_margin", "lesion_shape",
+    "lesion_internal", "lesion_calcification", "lesion_vascularity", "lesion_signal",
+    "lesion_enhancement", "additional_features",
+)
+TOPIC_COLUMNS = ("topic_mode", "selection")
+
+KINDS = {
+    "lesions": (LESION_COLUMNS, 3, get_complete_lesion_guide),
+    "topics": (TOPIC_COLUMNS, 2, get_topic_guide),
+}
+
+BATCH_SIZE = 256
+
+
+def render_batch(kind, rows):
+    render = KINDS[kind][2]
+    return [render(*row) for row in rows]
+
+
+def read_chunks(path, columns, required, chunksize):
+    # pandas (and pyarrow for Parquet) are only needed on this path.
+    import pandas as pd
+
+    if path.endswith((".parquet", ".pq")):
+        import pyarrow.parquet as pq
+
+        chunks = (batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize))
+    else:
+        chunks = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize)
+    for frame in chunks:
+        missing = [column for column in columns[:required] if column not in frame.columns]
+        if missing:
+            raise ValueError(f"{path} is missing required columns: {', '.join(missing)}")
+        frame = frame.reindex(columns=list(columns), fill_value="").fillna("").astype(str)
+        yield list(frame.itertuples(index=False, name=None))
+
+
+def write_result(handle, fmt, columns, number, row, guide):
+    if fmt == "jsonl":
+        record = dict(zip(columns, row))
+        record["row"] = number
+        record["guide"] = guide
+        handle.write(json.dumps(record, ensure_ascii=False))
+        handle.write("\n")
+    else:
+        handle.write(f"<!-- row {number} -->\n{guide}\n")
+
+
+def run(kind, input_path, output, fmt="jsonl", workers=None, chunksize=10000, progress=None):
+    columns, required, _ = KINDS[kind]
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    count = 0
+
+    def emit(batch, guides):
+        nonlocal count
+        for row, guide in zip(batch, guides):
+            write_result(output, fmt, columns, count, row, guide)
+            count += 1
+        if progress is not None:
+            progress(count, time.perf_counter() - start)
+
+    batches = (
+        rows[offset:offset + BATCH_SIZE]
+        for rows in read_chunks(input_path, columns, required, chunksize)
+        for offset in range(0, len(rows), BATCH_SIZE)
+    )
+    for batch, guides in map_batches(render_batch, batches, workers, kind):
+        emit(batch, guides)
+    return count, time.perf_counter() - start
+
+
+def map_batches(func, batches, workers, *args):
+    # Yields (batch, func(*args, batch)) in input order, computed across a
+    # process pool with at most workers * 2 batches in flight.
+    if workers == 1:
+        for batch in batches:
+            yield batch, func(*(args + (batch,)))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append((batch, pool.submit(func, *(args + (batch,)))))
+            if len(pending) >= workers * 2:
+                batch, future = pending.popleft()
+                yield batch, future.result()
+        while pending:
+            batch, future = pending.popleft()
+            yield batch, future.result()
+
+
+def run_to_output(path, run_batches):
+    # The command-line side of a batch run: calls run_batches(output,
+    # progress) with the output file ("-" for stdout), reports progress on
+    # stderr at most once a second and the throughput at the end.
+    last_report = [0.0]
+
+    def progress(count, elapsed):
+        if elapsed - last_report[0] < 1:
+            return
+        last_report[0] = elapsed
+        print(f"\r{count} rows, {count / elapsed if elapsed else 0:.0f} rows/sec", end="", file=sys.stderr)
+
+    if path == "-":
+        count, elapsed = run_batches(sys.stdout, progress)
+    else:
+        with open(path, "w", encoding="utf-8") as handle:
+            count, elapsed = run_batches(handle, progress)
+    print(f"\r{count} rows in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.0f} rows/sec)", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m radiology_guide.batch",
+                                     description="Render guides for a CSV or Parquet file of cases.")
+    parser.add_argument("kind", choices=sorted(KINDS), help="which guide to render for each row")
+    parser.add_argument("input", help="CSV or Parquet file; columns are named after the guide parameters")
+    parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    parser.add_argument("-f", "--format", choices=("jsonl", "markdown"),
+                        help="output format (default: from the output extension, else jsonl)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=10000, help="rows read from the input at a time")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("markdown" if args.output.endswith((".md", ".markdown")) else "jsonl")
+
+    run_to_output(args.output, lambda output, progress: run(args.kind, args.input, output, fmt, args.workers,
+                                                             args.chunksize, progress))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
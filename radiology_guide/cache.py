@@ -0,0 +1,106 @@
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+
+# =============================================================================
+# Process-wide Render Cache
+# =============================================================================
+# Streamlit reruns the script on every widget change, but the guide text only
+# depends on the selected inputs. Rendered guides are kept here, shared by all
+# sessions of the server process, with LRU eviction past `maxsize` entries and
+# an optional time-to-live so stale entries eventually drop out.
+#
+# When the guide content is reloaded, invalidate() drops only the entries for
+# the affected inputs. It also bumps `generation`; a value computed before the
+# bump may come from the old content, so put() discards it.
+
+
+class RenderCache:
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, generation=None):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def invalidate(self, predicate):
+        # Removes the entries whose key satisfies `predicate`; returns how many.
+        with self._lock:
+            self.generation += 1
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def memoize(cache):
+    # The arguments are the key as passed: the rendered guide echoes the free
+    # text, so inputs that differ only in whitespace get entries of their own.
+    # Keyword arguments are bound to their positions first, so a call by
+    # keyword shares the entry of the same call by position.
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if kwargs or len(args) != len(signature.parameters):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                args = bound.args
+            value = cache.get(args)
+            if value is None:
+                generation = cache.generation
+                value = func(*args)
+                cache.put(args, value, generation)
+            return value
+        wrapper.cache = cache
+        return wrapper
+    return decorator
@@ -0,0 +1,266 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from radiology_guide import options
+from radiology_guide.guides import LESION_FOOTER, get_topic_guide, rule_body
+from radiology_guide.rules import default_engine
+from radiology_guide.util import atomic_write
+
+# =============================================================================
+# Static Site Export
+# =============================================================================
+# Pre-renders every guide page the sidebar can reach to Markdown and HTML, so
+# most readers can be served by a plain static file server:
+#
+#   python -m radiology_guide.export site/
+#
+# Pages are the (topic_mode, selection) topic guides and, for every
+# (modality, organ, lesion_type), the lesion guidance the rule engine selects
+# for it. The ranked differentials depend on the lesion characteristics and
+# still need the app. Next to the pages the export writes index.html,
+# search.json (title, URL and plain text of every page, for client-side
+# search) and manifest.json, which records a fingerprint of each page's source
+# content; a later export only re-renders the pages whose fingerprint changed
+# and removes pages that no longer exist.
+
+# Bump when the page layout or the Markdown conversion changes, so the next
+# export re-renders everything.
+EXPORT_VERSION = 1
+
+MANIFEST_NAME = "manifest.json"
+SEARCH_NAME = "search.json"
+BATCH_SIZE = 32
+
+LESION_PAGE_HEADER = (
+    "## Lesion Analysis Guide\n\n"
+    "**Modality:** {modality}\n\n"
+    "**Organ/System:** {organ}\n\n"
+    "**Lesion Type:** {lesion_type}\n\n"
+    "---\n\n"
+)
+
+HTML_PAGE = (
+    "<!DOCTYPE html>\n"
+    "<html lang=\"en\">\n"
+    "<head>\n"
+    "<meta charset=\"utf-8\">\n"
+    "<meta name=\"viewport\" content=\"width=device-width, initial-scale=1\">\n"
+    "<title>{title} - Radiology Pocket Guide</title>\n"
+    "</head>\n"
+    "<body>\n"
+    "<p><a href=\"{root}index.html\">Radiology Pocket Guide</a></p>\n"
+    "{body}"
+    "</body>\n"
+    "</html>\n"
+)
+
+# path: page location relative to the output directory, without extension
+Page = namedtuple("Page", "path title kind key markdown")
+
+
+def slug(value):
+    return re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-")
+
+
+def fingerprint(page):
+    digest = hashlib.sha256(f"{EXPORT_VERSION}\0{page.title}\0{page.markdown}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def pages():
+    for topic_mode, selection in options.topic_keys():
+        yield Page(
+            f"topics/{slug(topic_mode)}/{slug(selection)}", f"{topic_mode}: {selection}",
+            "topic", (topic_mode, selection), get_topic_guide(topic_mode, selection),
+        )
+    engine = default_engine()
+    for modality, organ, lesion_type in options.lesion_keys():
+        # Without characteristics only unconditional rules match, which is the
+        # guidance shown for the key before any "when" refinement applies.
+        rule = engine.resolve(modality, organ, lesion_type)
+        markdown = "".join((
+            LESION_PAGE_HEADER.format(modality=modality, organ=organ, lesion_type=lesion_type),
+            rule_body(rule),
+            LESION_FOOTER,
+        ))
+        yield Page(
+            f"lesions/{slug(modality)}/{slug(organ)}/{slug(lesion_type)}",
+            f"{modality} {organ} {lesion_type}", "lesion", (modality, organ, lesion_type), markdown,
+        )
+
+
+# =============================================================================
+# Markdown to HTML
+# =============================================================================
+# Covers the subset of Markdown the guides use: ## / ### headings, bold text,
+# links, bullet and numbered lists, horizontal rules and paragraphs.
+BOLD_PATTERN = re.compile(r"\*\*(.+?)\*\*")
+LINK_PATTERN = re.compile(r"\[([^\]]+)\]\(([^)\s]+)\)")
+NUMBERED_PATTERN = re.compile(r"\d+\.\s+")
+MARKUP_PATTERN = re.compile(r"\*\*|^#+\s*|^-\s+|^---$", re.MULTILINE)
+
+
+def inline_html(text):
+    text = html.escape(text)
+    text = BOLD_PATTERN.sub(r"<strong>\1</strong>", text)
+    return LINK_PATTERN.sub(r'<a href="\2">\1</a>', text)
+
+
+def markdown_to_html(markdown):
+    parts = []
+    paragraph = []
+    open_list = None
+
+    def close():
+        nonlocal open_list
+        if paragraph:
+            parts.append(f"<p>{' '.join(paragraph)}</p>\n")
+            del paragraph[:]
+        if open_list:
+            parts.append(f"</{open_list}>\n")
+            open_list = None
+
+    for line in markdown.splitlines():
+        stripped = line.strip()
+        numbered = NUMBERED_PATTERN.match(stripped)
+        if stripped.startswith("- ") or numbered:
+            tag = "ol" if numbered else "ul"
+            if paragraph or open_list != tag:
+                close()
+                parts.append(f"<{tag}>\n")
+                open_list = tag
+            item = stripped[numbered.end():] if numbered else stripped[2:]
+            parts.append(f"<li>{inline_html(item)}</li>\n")
+            continue
+        close()
+        if not stripped:
+            continue
+        if stripped == "---":
+            parts.append("<hr>\n")
+        elif stripped.startswith("#"):
+            level = min(len(stripped) - len(stripped.lstrip("#")), 6)
+            parts.append(f"<h{level}>{inline_html(stripped.lstrip('#').strip())}</h{level}>\n")
+        else:
+            paragraph.append(inline_html(stripped))
+    close()
+    return "".join(parts)
+
+
+def plain_text(markdown):
+    return " ".join(LINK_PATTERN.sub(r"\1", MARKUP_PATTERN.sub("", markdown)).split())
+
+
+# =============================================================================
+# Writing
+# =============================================================================
+def write_file(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with atomic_write(path) as handle:
+        handle.write(text)
+
+
+def render_pages(output_dir, batch):
+    for page in batch:
+        root = "../" * page.path.count("/")
+        write_file(os.path.join(output_dir, page.path + ".md"), page.markdown)
+        write_file(os.path.join(output_dir, page.path + ".html"), HTML_PAGE.format(
+            title=html.escape(page.title), root=root, body=markdown_to_html(page.markdown),
+        ))
+    return len(batch)
+
+
+def render_index(all_pages):
+    parts = ["<h1>Radiology Pocket Guide</h1>\n"]
+    for kind, heading in (("topic", "Radiology Topics"), ("lesion", "Lesion Analysis")):
+        parts.append(f"<h2>{heading}</h2>\n<ul>\n")
+        for page in all_pages:
+            if page.kind == kind:
+                parts.append(f'<li><a href="{page.path}.html">{html.escape(page.title)}</a></li>\n')
+        parts.append("</ul>\n")
+    return HTML_PAGE.format(title="Index", root="", body="".join(parts))
+
+
+def read_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as handle:
+            manifest = json.load(handle)
+    except (OSError, ValueError):
+        return {}
+    # Pages from an older export version are kept too: their fingerprints
+    # no longer match, but they are still needed to find removed pages.
+    return manifest.get("pages", {})
+
+
+def export(output_dir, workers=None, force=False):
+    # Returns (rendered, unchanged, removed) page counts.
+    all_pages = list(pages())
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    # Read even with `force`, which only decides what is re-rendered, so
+    # pages that no longer exist are still removed.
+    previous = read_manifest(manifest_path)
+    fingerprints = {page.path: fingerprint(page) for page in all_pages}
+
+    stale = [
+        page for page in all_pages
+        if force or previous.get(page.path) != fingerprints[page.path]
+        or not os.path.exists(os.path.join(output_dir, page.path + ".html"))
+    ]
+    batches = [stale[offset:offset + BATCH_SIZE] for offset in range(0, len(stale), BATCH_SIZE)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(batches) <= 1:
+        for batch in batches:
+            render_pages(output_dir, batch)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for _ in pool.map(render_pages, [output_dir] * len(batches), batches):
+                pass
+
+    removed = 0
+    for path in set(previous) - set(fingerprints):
+        for extension in (".md", ".html"):
+            try:
+                os.remove(os.path.join(output_dir, path + extension))
+            except FileNotFoundError:
+                continue
+        removed += 1
+
+    write_file(os.path.join(output_dir, "index.html"), render_index(all_pages))
+    write_file(os.path.join(output_dir, SEARCH_NAME), json.dumps([
+        {"url": page.path + ".html", "title": page.title, "kind": page.kind, "key": page.key,
+         "text": plain_text(page.markdown)}
+        for page in all_pages
+    ], ensure_ascii=False))
+    # The manifest is written last, so an interrupted export is redone.
+    write_file(manifest_path, json.dumps({"version": EXPORT_VERSION, "pages": fingerprints}, indent=1,
+                                         sort_keys=True))
+    return len(stale), len(all_pages) - len(stale), removed
+
+
+# =============================================================================
+# Command Line
+# =============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m radiology_guide.export",
+                                     description="Pre-render every guide page to static Markdown and HTML.")
+    parser.add_argument("output", help="output directory")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="re-render every page, ignoring the manifest")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    rendered, unchanged, removed = export(args.output, args.workers, args.force)
+    print(f"Rendered {rendered} pages ({unchanged} unchanged, {removed} removed) into {args.output} "
+          f"in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import deque, namedtuple
+
+from radiology_guide.util import ProcessDefault
+
+# =============================================================================
+# Finding Extraction
+# =============================================================================
+# Finds known radiology findings in free text such as the "Additional
+# Features" field ("diffusion restriction, hemorrhagic components, no
+# edema"). The lexicon maps each canonical finding to its synonyms and lists
+# negation triggers; every term is tokenized and compiled into one
+# Aho-Corasick automaton over words, so a single left-to-right pass over the
+# text reports every term occurrence. The cost of a pass depends on the length
+# of the text and the number of matches, not on the size of the lexicon.
+#
+# Negation follows NegEx: a trigger before a finding ("no", "without",
+# "negative for") or after it ("not seen", "ruled out") negates the findings
+# within a few words on that side, up to a clause boundary (sentence
+# punctuation or a conjunction such as "but") or another trigger. A comma
+# also ends the scope once it has negated a finding, so "no edema,
+# hemorrhage" only negates the edema while "no edema or hemorrhage" negates
+# both. A trigger that works in both directions ("absent") reaches back if
+# that negates a finding and forward otherwise.
+#
+#   python -m radiology_guide.findings extract "restricted diffusion, no edema"
+#   python -m radiology_guide.findings batch reports.csv --column text -o findings.jsonl
+
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(__file__), "data", "findings.json")
+
+# Words a negation trigger reaches.
+NEGATION_WINDOW = 6
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[.;:!?,]")
+# Punctuation that ends a clause; commas separate list items and only end a
+# negation scope that has already negated a finding.
+CLAUSE_PUNCTUATION = frozenset(".;:!?")
+
+# Token-level match kinds.
+FINDING, NEGATION_BEFORE, NEGATION_AFTER = 0, 1, 2
+
+Finding = namedtuple("Finding", ["name", "term", "negated", "start", "end"])
+
+
+def tokenize(text):
+    # (token, start, end) with character offsets into `text`.
+    return [(match.group(), match.start(), match.end()) for match in TOKEN_PATTERN.finditer(text.lower())]
+
+
+class FindingExtractor:
+    def __init__(self, findings, negations_before=(), negations_after=(), terminators=()):
+        # Automaton state 0 is the root. goto[state] maps a word to the next
+        # state, fail[state] is the longest proper suffix state and out[state]
+        # the (length in words, payload) of every term ending there.
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        self.terminators = frozenset(terminators)
+        self.terms = 0
+        for name, synonyms in findings.items():
+            for term in (name,) + tuple(synonyms):
+                self._add(term, (FINDING, name, term))
+        for term in negations_before:
+            self._add(term, (NEGATION_BEFORE, None, term))
+        for term in negations_after:
+            self._add(term, (NEGATION_AFTER, None, term))
+        self._link()
+
+    def _add(self, term, payload):
+        words = [token for token, _, _ in tokenize(term)]
+        if not words:
+            return
+        state = 0
+        for word in words:
+            following = self.goto[state].get(word)
+            if following is None:
+                following = len(self.goto)
+                self.goto[state][word] = following
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            state = following
+        self.out[state].append((len(words), payload))
+        self.terms += 1
+
+    def _link(self):
+        # Breadth-first, so the failure state of a node is always linked before it.
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, following in self.goto[state].items():
+                queue.append(following)
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(word, 0)
+                self.fail[following] = target if target != following else 0
+                self.out[following] = self.out[following] + self.out[self.fail[following]]
+
+    def __len__(self):
+        return self.terms
+
+    def matches(self, tokens):
+        # Every term occurrence as (first token, end token, payload), in one pass.
+        goto, fail, out = self.goto, self.fail, self.out
+        found = []
+        state = 0
+        for position, (word, _, _) in enumerate(tokens):
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            for length, payload in out[state]:
+                found.append((position + 1 - length, position + 1, payload))
+        return found
+
+    def extract(self, text):
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+        # Leftmost-longest: overlapping shorter terms ("effusion" inside
+        # "pleural effusion") are dropped. Terms with the same span, such as
+        # a trigger that works in both directions, are all kept.
+        found = sorted(self.matches(tokens), key=lambda match: (match[0], match[0] - match[1]))
+        kept = []
+        end = 0
+        for match in found:
+            if match[0] >= end or (kept and match[:2] == kept[-1][:2]):
+                kept.append(match)
+                end = match[1]
+
+        # (first, last) token span -> the kinds of the terms matched there.
+        spans = {}
+        for first, last, (kind, _, _) in kept:
+            spans.setdefault((first, last), set()).add(kind)
+        starting = {span[0]: span for span in spans}
+        ending = {span[1]: span for span in spans}
+        negated = set()
+        for span, kinds in spans.items():
+            backward = self._scope(tokens, spans, ending, span[0], -1) if NEGATION_AFTER in kinds else []
+            if NEGATION_BEFORE in kinds and not backward:
+                negated.update(self._scope(tokens, spans, starting, span[1], 1))
+            negated.update(backward)
+
+        return [
+            Finding(name, term, (first, last) in negated, tokens[first][1], tokens[last - 1][2])
+            for first, last, (kind, name, term) in kept if kind == FINDING
+        ]
+
+    def _scope(self, tokens, spans, adjacent, position, step):
+        # Finding spans negated by a trigger that ends (step 1) or starts
+        # (step -1) at `position`, walking away from it a token at a time.
+        # `adjacent` maps the position a span is entered from to the span.
+        negated = []
+        if step > 0:
+            stop = min(position + NEGATION_WINDOW, len(tokens))
+        else:
+            stop = max(position - NEGATION_WINDOW, 0)
+        while (stop - position) * step > 0:
+            span = adjacent.get(position)
+            if span is not None:
+                if spans[span] != {FINDING}:
+                    break
+                negated.append(span)
+                position = span[1] if step > 0 else span[0]
+                continue
+            word = tokens[position if step > 0 else position - 1][0]
+            if word in CLAUSE_PUNCTUATION or word in self.terminators or (word == "," and negated):
+                break
+            position += step
+        return negated
+
+    def summarize(self, text):
+        # (present, absent) canonical finding names; a finding mentioned both
+        # ways counts as present.
+        present = set()
+        absent = set()
+        for finding in self.extract(text):
+            (absent if finding.negated else present).add(finding.name)
+        return frozenset(present), frozenset(absent - present)
+
+
+def read_lexicon(path=DEFAULT_LEXICON_PATH):
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def lexicon_extractor(data):
+    negations = data.get("negations", {})
+    return FindingExtractor(data["findings"], negations.get("before", ()), negations.get("after", ()),
+                            data.get("terminators", ()))
+
+
+def load_lexicon(path=DEFAULT_LEXICON_PATH):
+    return lexicon_extractor(read_lexicon(path))
+
+
+def changed_terms(old, new):
+    # The terms whose meaning differs between two lexicons: every term of a
+    # finding that was added, removed or given other synonyms, and the
+    # negation triggers and terminators that were added, removed or moved.
+    # Text that mentions none of them yields the same findings with both.
+    terms = set()
+    for name in set(old["findings"]) | set(new["findings"]):
+        before, after = old["findings"].get(name), new["findings"].get(name)
+        if before != after:
+            for synonyms in (before, after):
+                if synonyms is not None:
+                    terms.update((name,) + tuple(synonyms))
+    for direction in ("before", "after"):
+        terms.update(set(old.get("negations", {}).get(direction, ()))
+                     ^ set(new.get("negations", {}).get(direction, ())))
+    terms.update(set(old.get("terminators", ())) ^ set(new.get("terminators", ())))
+    return terms
+
+
+default_extractor = ProcessDefault(load_lexicon)
+
+
+# =============================================================================
+# Batch Extraction
+# =============================================================================
+def extract_batch(rows):
+    # Runs in the worker processes; each builds the automaton once.
+    extractor = default_extractor()
+    return [extractor.extract(row[0]) for row in rows]
+
+
+def read_text_chunks(path, column, chunksize):
+    # Plain text files hold one report per line; CSV and Parquet are read in
+    # chunks through pandas like the guide batch mode.
+    if path.endswith(".txt") or path == "-":
+        handle = sys.stdin if path == "-" else open(path, encoding="utf-8")
+        try:
+            chunk = []
+            for line in handle:
+                chunk.append((line.rstrip("\n"),))
+                if len(chunk) >= chunksize:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+        return
+    from radiology_guide.batch import read_chunks
+
+    for chunk in read_chunks(path, (column,), 1, chunksize):
+        yield chunk
+
+
+def run(input_path, output, column="text", workers=None, chunksize=10000, progress=None):
+    from radiology_guide.batch import BATCH_SIZE, map_batches
+
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    count = 0
+    batches = (
+        rows[offset:offset + BATCH_SIZE]
+        for rows in read_text_chunks(input_path, column, chunksize)
+        for offset in range(0, len(rows), BATCH_SIZE)
+    )
+    for _, results in map_batches(extract_batch, batches, workers):
+        for findings in results:
+            output.write(json.dumps({
+                "row": count,
+                "present": sorted({finding.name for finding in findings if not finding.negated}),
+                "absent": sorted({finding.name for finding in findings if finding.negated}),
+                "matches": [finding._asdict() for finding in findings],
+            }, ensure_ascii=False))
+            output.write("\n")
+            count += 1
+        if progress is not None:
+            progress(count, time.perf_counter() - start)
+    return count, time.perf_counter() - start
+
+
+# =============================================================================
+# Command Line
+# =============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m radiology_guide.findings",
+                                     description="Extract known findings from free-text report content.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    extract_parser = commands.add_parser("extract", help="print the findings in one text")
+    extract_parser.add_argument("text")
+    batch_parser = commands.add_parser("batch", help="extract findings for every row of a file as JSONL")
+    batch_parser.add_argument("input", help="CSV, Parquet, or .txt with one report per line ('-' for stdin)")
+    batch_parser.add_argument("--column", default="text", help="CSV/Parquet column holding the text")
+    batch_parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    batch_parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    batch_parser.add_argument("--chunksize", type=int, default=10000, help="rows read from the input at a time")
+    args = parser.parse_args(argv)
+
+    if args.command == "extract":
+        for finding in default_extractor().extract(args.text):
+            print(f"{finding.name:<30} {'absent' if finding.negated else 'present':<8} {finding.term!r}")
+        return 0
+
+    from radiology_guide.batch import run_to_output
+
+    run_to_output(args.output, lambda output, progress: run(args.input, output, args.column, args.workers,
+                                                             args.chunksize, progress))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
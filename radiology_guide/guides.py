@@ -0,0 +1,349 @@
+from radiology_guide.cache import RenderCache, memoize
+from radiology_guide.options import DEFAULT_ADDITIONAL_FEATURES
+from radiology_guide.rules import default_engine
+
+# =============================================================================
+# Guide Renderers
+# =============================================================================
+# Both generators only depend on their inputs, so their output is memoized in
+# process-wide caches shared by every Streamlit session. Fixed text is kept in
+# templates and pre-joined blocks; a guide is assembled with one join instead
+# of a long run of string concatenations.
+#
+# When a memory-mapped knowledge base is configured (RADIOLOGY_GUIDE_KB, see
+# radiology_guide.kb) the rule bodies and topic blocks are read from it instead
+# of the bundled content.
+
+lesion_guide_cache = RenderCache(maxsize=4096, ttl=6 * 60 * 60)
+topic_guide_cache = RenderCache(maxsize=256)
+
+# =============================================================================
+# Lesion Analysis Guide
+# =============================================================================
+LESION_HEADER = (
+    "## Lesion Analysis Guide\n\n"
+    "**Modality:** {modality}\n\n"
+    "**Organ/System:** {organ}\n\n"
+    "**Lesion Type:** {lesion_type}\n\n"
+    "**Provided Characteristics:**\n"
+    "- **Size:** {lesion_size} cm\n"
+    "- **Margin:** {lesion_margin}\n"
+    "- **Shape:** {lesion_shape}\n"
+    "- **Internal Architecture:** {lesion_internal}\n"
+    "- **Calcification:** {lesion_calcification}\n"
+    "- **Vascularity:** {lesion_vascularity}\n"
+    "- **Signal/Density:** {lesion_signal}\n"
+    "- **Enhancement:** {lesion_enhancement}\n"
+    "- **Additional Features:** {additional_features}\n\n"
+    "---\n\n"
+)
+
+RANKED_DIFFERENTIALS = 3
+
+LESION_FOOTER = (
+    "---\n"
+    "**Remember:** This analysis is intended as an educational aid. Always integrate imaging with clinical findings and expert consultation.\n"
+)
+
+
+@memoize(lesion_guide_cache)
+def get_complete_lesion_guide(modality, organ, lesion_type, lesion_size, lesion_margin, lesion_shape,
+                              lesion_internal, lesion_calcification, lesion_vascularity, lesion_signal,
+                              lesion_enhancement, additional_features):
+    header = LESION_HEADER.format(
+        modality=modality, organ=organ, lesion_type=lesion_type, lesion_size=lesion_size,
+        lesion_margin=lesion_margin, lesion_shape=lesion_shape, lesion_internal=lesion_internal,
+        lesion_calcification=lesion_calcification, lesion_vascularity=lesion_vascularity,
+        lesion_signal=lesion_signal, lesion_enhancement=lesion_enhancement,
+        additional_features=additional_features,
+    )
+    characteristics = dict(
+        margin=lesion_margin, shape=lesion_shape, internal=lesion_internal,
+        calcification=lesion_calcification, vascularity=lesion_vascularity,
+        signal=lesion_signal, enhancement=lesion_enhancement,
+    )
+    present, absent = extract_findings(additional_features)
+    # Content is chosen by the rule engine: a hash lookup on (modality, organ, lesion_type)
+    # followed by the secondary filters on the lesion characteristics and findings.
+    rule = default_engine().resolve(modality, organ, lesion_type, finding=present, **characteristics)
+    # NumPy is only loaded once a lesion guide is actually rendered, which keeps
+    # importing the package cheap for topic-only and tooling use.
+    from radiology_guide.scoring import default_scorer
+
+    ranked = default_scorer().rank(
+        dict(characteristics, modality=modality, organ=organ, lesion_type=lesion_type, finding=present,
+             absent=absent),
+        RANKED_DIFFERENTIALS,
+    )
+    return "".join((header, render_findings(present, absent), rule_body(rule), render_differentials(ranked),
+                    LESION_FOOTER))
+
+
+def extract_findings(additional_features):
+    # (present, absent) findings named in the free text. The sidebar's
+    # placeholder text is an example, not a description of the lesion.
+    if not additional_features or additional_features == DEFAULT_ADDITIONAL_FEATURES:
+        return frozenset(), frozenset()
+    from radiology_guide.findings import default_extractor
+
+    return default_extractor().summarize(additional_features)
+
+
+def render_findings(present, absent):
+    if not present and not absent:
+        return ""
+    parts = ["**Findings Recognized in Additional Features:**\n"]
+    if present:
+        parts.append(f"- Present: {', '.join(sorted(present))}\n")
+    if absent:
+        parts.append(f"- Absent: {', '.join(sorted(absent))}\n")
+    parts.append("\n")
+    return "".join(parts)
+
+
+def rule_body(rule):
+    return rule.body if rule is not None else ""
+
+
+def render_differentials(ranked):
+    ranked = [differential for differential in ranked if differential.score > 0]
+    if not ranked:
+        return ""
+    parts = ["**Ranked Differentials (from the provided characteristics):**\n"]
+    for number, differential in enumerate(ranked, 1):
+        reasons = ", ".join(f"{feature.replace(':', ': ')} {weight:+.1f}"
+                            for feature, weight in differential.contributions)
+        parts.append(f"{number}. {differential.name} (score {differential.score:.1f}; {reasons})\n")
+    parts.append("\n")
+    return "".join(parts)
+
+
+# =============================================================================
+# Radiology Topics Guide
+# =============================================================================
+SECTION_TOPICS = {
+    "Anatomy": (
+        "**Anatomy in Radiology:**",
+        "- Detailed anatomical descriptions including normal variants and vascular supply.",
+        "- Example: Anatomy of the Circle of Willis, bronchial arterial variations, hepatic arterial variants, etc.",
+        "- [Radiopaedia – Anatomy](https://radiopaedia.org/articles/anatomy)",
+    ),
+    "Approach": (
+        "**Approaches in Radiology:**",
+        "- Discussion of imaging protocols, patient positioning, and interventional approaches.",
+        "- Examples include CT-guided biopsies, ultrasound-guided drainage, and fluoroscopy-guided procedures.",
+    ),
+    "Artificial Intelligence": (
+        "**Artificial Intelligence in Radiology:**",
+        "- AI applications for image analysis, segmentation, and computer-aided diagnosis.",
+        "- Future trends and current research in deep learning for radiology.",
+    ),
+    "Classifications": (
+        "**Radiologic Classifications:**",
+        "- Standardized systems (e.g., BI-RADS, LI-RADS, TI-RADS) used to categorize lesions.",
+    ),
+    "Gamuts": (
+        "**Radiology Gamuts:**",
+        "- Comprehensive lists of disease processes for a given finding (e.g., differential diagnosis of a pulmonary nodule).",
+    ),
+    "Imaging Technology": (
+        "**Imaging Technology:**",
+        "- Advances in imaging modalities, such as high-resolution CT, functional MRI, and digital radiography.",
+    ),
+    "Interventional Radiology": (
+        "**Interventional Radiology:**",
+        "- Techniques, devices, and protocols for image-guided interventions.",
+        "- Examples include embolization, ablation, and vascular stenting.",
+    ),
+    "Mnemonics": (
+        "**Radiology Mnemonics:**",
+        "- Memory aids to recall imaging findings and differential diagnoses.",
+        '- Example: "VINDICATE" (Vascular, Infectious, Neoplastic, Degenerative, Iatrogenic, Congenital, Autoimmune, Traumatic, Endocrine).',
+    ),
+    "Pathology": (
+        "**Pathology:**",
+        "- Radiologic-pathologic correlation for various disease entities.",
+    ),
+    "Radiography": (
+        "**Radiography:**",
+        "- Principles and techniques of plain film imaging.",
+    ),
+    "Signs": (
+        "**Radiologic Signs:**",
+        "- Named signs (e.g., “thumbprint sign”, “air crescent sign”) and their diagnostic implications.",
+    ),
+    "Staging": (
+        "**Staging in Radiology:**",
+        "- Imaging criteria for cancer staging and response assessment.",
+    ),
+    "Syndromes": (
+        "**Radiologic Syndromes:**",
+        "- Descriptions of syndromes as seen on imaging (e.g., “Pancoast syndrome”, “Stafne bone cavity”).",
+    ),
+}
+
+SYSTEM_TOPICS = {
+    "Breast": (
+        "**Breast Imaging:**",
+        "- Techniques: Mammography, ultrasound, MRI.",
+        "- Common findings: masses, calcifications, architectural distortions.",
+        "- Standardized reporting: BI-RADS.",
+    ),
+    "Cardiac": (
+        "**Cardiac Imaging:**",
+        "- Modalities: Cardiac CT, MRI, and nuclear imaging.",
+        "- Topics: Coronary artery disease, cardiomyopathies, congenital heart disease.",
+    ),
+    "Central Nervous System": (
+        "**CNS Imaging:**",
+        "- Modalities: CT, MRI, PET.",
+        "- Topics: Brain tumors, stroke, demyelinating disease.",
+    ),
+    "Chest": (
+        "**Chest Imaging:**",
+        "- Modalities: Chest X-ray, CT, MRI, PET-CT.",
+        "- Topics: Lung nodules, interstitial lung disease, mediastinal masses.",
+    ),
+    "Forensic": (
+        "**Forensic Radiology:**",
+        "- Applications: Post-mortem imaging, trauma assessment, identification.",
+    ),
+    "Gastrointestinal": (
+        "**Gastrointestinal Imaging:**",
+        "- Modalities: CT, MRI, ultrasound.",
+        "- Topics: Abdominal masses, inflammatory bowel disease, pancreatitis.",
+    ),
+    "Gynaecology": (
+        "**Gynaecologic Imaging:**",
+        "- Modalities: Ultrasound, MRI, CT.",
+        "- Topics: Ovarian masses, uterine fibroids, endometrial pathology.",
+    ),
+    "Haematology": (
+        "**Haematologic Imaging:**",
+        "- Topics: Lymphadenopathy, splenomegaly, marrow disorders.",
+    ),
+    "Head & Neck": (
+        "**Head & Neck Imaging:**",
+        "- Modalities: CT, MRI, ultrasound.",
+        "- Topics: Thyroid nodules, salivary gland tumors, lymph node evaluation.",
+    ),
+    "Hepatobiliary": (
+        "**Hepatobiliary Imaging:**",
+        "- Modalities: Ultrasound, CT, MRI, nuclear medicine.",
+        "- Topics: Liver lesions, biliary obstruction, cirrhosis.",
+    ),
+    "Interventional": (
+        "**Interventional Radiology:**",
+        "- Topics: Embolization, ablation, vascular interventions.",
+    ),
+    "Musculoskeletal": (
+        "**Musculoskeletal Imaging:**",
+        "- Modalities: X-ray, CT, MRI, ultrasound.",
+        "- Topics: Fractures, tumors, inflammatory arthropathies.",
+    ),
+    "Obstetrics": (
+        "**Obstetric Imaging:**",
+        "- Modalities: Ultrasound, MRI.",
+        "- Topics: Fetal anatomy, placental disorders, congenital anomalies.",
+    ),
+    "Oncology": (
+        "**Oncologic Imaging:**",
+        "- Modalities: CT, MRI, PET-CT.",
+        "- Topics: Tumor staging, treatment response, metastases.",
+    ),
+    "Paediatrics": (
+        "**Paediatric Imaging:**",
+        "- Special considerations in radiation dose and imaging protocols.",
+        "- Topics: Congenital anomalies, pediatric tumors, trauma.",
+    ),
+    "Spine": (
+        "**Spine Imaging:**",
+        "- Modalities: X-ray, CT, MRI.",
+        "- Topics: Disc herniations, tumors, degenerative changes.",
+    ),
+    "Trauma": (
+        "**Trauma Imaging:**",
+        "- Modalities: X-ray, CT, MRI.",
+        "- Topics: Fractures, hemorrhage, organ lacerations.",
+    ),
+    "Urogenital": (
+        "**Urogenital Imaging:**",
+        "- Modalities: Ultrasound, CT, MRI.",
+        "- Topics: Renal masses, bladder pathology, prostate evaluation.",
+    ),
+    "Vascular": (
+        "**Vascular Imaging:**",
+        "- Modalities: CT angiography, MR angiography, ultrasound.",
+        "- Topics: Aneurysms, dissections, occlusive disease.",
+    ),
+}
+
+CASES_BODY = (
+    "A collection of interesting and educational cases in this system:",
+    "- Review rare and common pathologies",
+    "- See examples of atypical presentations",
+    "- Detailed discussion of imaging findings and clinical correlation",
+    "",
+    "For more cases, please visit [Radiopaedia Cases](https://radiopaedia.org/cases).",
+)
+
+TOPIC_HEADER = "## Radiology Topics Guide\n\n"
+
+TOPIC_FOOTER = (
+    "---\n"
+    "**Note:** This section is an evolving repository of radiology knowledge. For the most up-to-date information, always consult primary resources and Radiopaedia directly.\n"
+)
+
+
+def join_block(lines):
+    return "".join(line + "\n" for line in lines) + "\n"
+
+
+# (topic_mode, heading template, pre-joined blocks by selection, fallback block)
+TOPIC_MODES = {
+    "By Section": (
+        "### Section: {}\n\n",
+        {name: join_block(lines) for name, lines in SECTION_TOPICS.items()},
+        "Detailed information on this section is not available yet.\n\n",
+    ),
+    "By System": (
+        "### System: {}\n\n",
+        {name: join_block(lines) for name, lines in SYSTEM_TOPICS.items()},
+        "Detailed system-specific guidance is under development.\n\n",
+    ),
+    "Cases": (
+        "### Radiology Cases: {}\n\n",
+        {},
+        join_block(CASES_BODY),
+    ),
+}
+
+
+@memoize(topic_guide_cache)
+def get_topic_guide(topic_mode, selection):
+    if topic_mode not in TOPIC_MODES:
+        return "".join((TOPIC_HEADER, "Topic not recognized. Please select a valid option.\n\n", TOPIC_FOOTER))
+    heading, _, fallback = TOPIC_MODES[topic_mode]
+    block = topic_block(topic_mode, selection)
+    if block is None:
+        block = topic_fallback(topic_mode, fallback)
+    return "".join((TOPIC_HEADER, heading.format(selection), block, TOPIC_FOOTER))
+
+
+def topic_block(topic_mode, selection):
+    # The content block written for one selection, or None if there is none.
+    from radiology_guide.kb import default_kb
+
+    kb = default_kb()
+    if kb is not None:
+        return kb.get(("topic", topic_mode, selection))
+    return TOPIC_MODES[topic_mode][1].get(selection)
+
+
+def topic_fallback(topic_mode, fallback):
+    from radiology_guide.kb import default_kb
+
+    kb = default_kb()
+    if kb is not None:
+        return kb.get(("topic-fallback", topic_mode), fallback)
+    return fallback
@@ -0,0 +1,388 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+
+from radiology_guide.util import ProcessDefault, atomic_write
+
+try:
+    import fcntl
+except ImportError:  # Windows: manifest writes are not serialized across processes.
+    fcntl = None
+
+# =============================================================================
+# Image Mappings
+# =============================================================================
+# Example images keyed the same way as the guide content. The URLs are the
+# original Wikimedia sources; the app serves them from the local image store
+# below and only falls back to the remote URL when the store has no copy.
+
+LESION_IMAGES = {
+    ("CT", "Brain", "Mass"): (
+        "https://upload.wikimedia.org/wikipedia/commons/thumb/d/d7/CT_scan_of_brain_tumour.jpg/640px-CT_scan_of_brain_tumour.jpg",
+        "CT Brain Mass Example",
+    ),
+    ("Ultrasound", "Thyroid", "Mass"): (
+        "https://upload.wikimedia.org/wikipedia/commons/thumb/f/f0/Thyroid_ultrasound.jpg/640px-Thyroid_ultrasound.jpg",
+        "Ultrasound Thyroid Nodule Example",
+    ),
+}
+
+TOPIC_IMAGES = {
+    ("By Section", "Anatomy"): (
+        "https://upload.wikimedia.org/wikipedia/commons/thumb/8/8f/Gray1124.png/640px-Gray1124.png",
+        "Human Anatomy Example",
+    ),
+    ("By System", "Breast"): (
+        "https://upload.wikimedia.org/wikipedia/commons/thumb/3/3a/Mammogram_2.jpg/640px-Mammogram_2.jpg",
+        "Breast Imaging Example",
+    ),
+}
+
+
+def get_lesion_image(modality, organ, lesion_type):
+    return LESION_IMAGES.get((modality, organ, lesion_type), (None, None))
+
+
+def get_topic_image(topic_mode, selection):
+    return TOPIC_IMAGES.get((topic_mode, selection), (None, None))
+
+
+# =============================================================================
+# Local Image Store
+# =============================================================================
+# Images are stored once, content-addressed by the SHA-256 of the original
+# file, and decoded a single time on import to produce a few fixed-width
+# thumbnails. Lookups go through a byte-bounded in-memory LRU first, then the
+# files on disk; the disk store is trimmed least-recently-used first.
+#
+#   <root>/manifest.json              source name -> digest
+#   <root>/<aa>/<digest>-<width>.<ext> encoded thumbnails
+#
+# Sources are identified by the original file name, so a Wikimedia thumbnail
+# URL and a file copied into a local directory map to the same entry.
+#
+# Every server process has its own ImageStore on the same root. A process
+# writes the manifest by re-reading it under a file lock and merging in the
+# images it added since, so additions from other processes are kept.
+
+DEFAULT_STORE_PATH = os.environ.get(
+    "RADIOLOGY_GUIDE_IMAGE_STORE",
+    os.path.join(os.path.expanduser("~"), ".cache", "radiology_guide", "images"),
+)
+
+THUMBNAIL_WIDTHS = (160, 320, 640)
+DISPLAY_WIDTH = 640
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp")
+
+FETCH_TIMEOUT = 5
+# A failed fetch is not retried for this many seconds, so an unreachable host
+# costs one timeout instead of one per rerun.
+FETCH_RETRY_AFTER = 10 * 60
+
+log = logging.getLogger(__name__)
+
+
+def source_name(url_or_path):
+    name = urllib.parse.unquote(os.path.basename(urllib.parse.urlparse(url_or_path).path))
+    # Wikimedia thumbnails are named "<width>px-<original name>".
+    prefix, sep, rest = name.partition("px-")
+    if sep and prefix.isdigit():
+        name = rest
+    return name
+
+
+class MemoryLRU:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def discard(self, digest):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == digest]:
+                self.size -= len(self._entries.pop(key))
+
+
+class ImageStore:
+    def __init__(self, root=DEFAULT_STORE_PATH, max_disk_bytes=256 * 1024 * 1024,
+                 max_memory_bytes=32 * 1024 * 1024, allow_fetch=None):
+        self.root = root
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = MemoryLRU(max_memory_bytes)
+        if allow_fetch is None:
+            allow_fetch = not os.environ.get("RADIOLOGY_GUIDE_OFFLINE")
+        self.allow_fetch = allow_fetch
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self.sources, self.images = self._read_manifest()
+        # Added by this process since the manifest was last written.
+        self._added_sources = {}
+        self._added_images = {}
+        self._failed = {}
+        self._fetching = set()
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # Manifest
+    # -------------------------------------------------------------------------
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as handle:
+                manifest = json.load(handle)
+        except (OSError, ValueError):
+            return {}, {}
+        return manifest.get("sources", {}), manifest.get("images", {})
+
+    @contextlib.contextmanager
+    def _manifest_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.root, "manifest.lock"), "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            yield
+
+    def _save_manifest(self):
+        # Merges this process's additions into the manifest on disk, trims the
+        # merged store and writes it back. An image another process trimmed is
+        # gone from the disk copy and stays gone unless this process re-added it.
+        os.makedirs(self.root, exist_ok=True)
+        with self._manifest_lock():
+            sources, images = self._read_manifest()
+            images.update(self._added_images)
+            sources.update(self._added_sources)
+            self.sources = {name: digest for name, digest in sources.items() if digest in images}
+            self.images = images
+            self._added_sources = {}
+            self._added_images = {}
+            self._trim()
+            with atomic_write(self.manifest_path) as handle:
+                json.dump({"sources": self.sources, "images": self.images}, handle, indent=1, sort_keys=True)
+
+    def _path(self, digest, width, ext=None):
+        return os.path.join(self.root, digest[:2], f"{digest}-{width}.{ext or self.images[digest]['ext']}")
+
+    # -------------------------------------------------------------------------
+    # Adding images
+    # -------------------------------------------------------------------------
+    def add(self, name, data):
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest not in self.images:
+                self._added_images[digest] = self._write_thumbnails(digest, data)
+            self.sources[name] = self._added_sources[name] = digest
+            self._failed.pop(name, None)
+            self._save_manifest()
+        return digest
+
+    def _write_thumbnails(self, digest, data):
+        from PIL import Image
+
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        # Keep PNG for images that need it (palettes, transparency), JPEG otherwise.
+        if image.format == "PNG" or image.mode in ("P", "LA", "RGBA"):
+            fmt, ext = "PNG", "png"
+        else:
+            fmt, ext = "JPEG", "jpg"
+            image = image.convert("RGB")
+        info = {"width": image.width, "height": image.height, "ext": ext, "bytes": 0}
+        directory = os.path.join(self.root, digest[:2])
+        os.makedirs(directory, exist_ok=True)
+        for width in THUMBNAIL_WIDTHS:
+            thumb = image
+            if image.width > width:
+                thumb = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+            buffer = io.BytesIO()
+            thumb.save(buffer, fmt, optimize=True)
+            with atomic_write(self._path(digest, width, ext), "wb") as handle:
+                handle.write(buffer.getvalue())
+            info["bytes"] += buffer.tell()
+        self.images[digest] = info
+        return info
+
+    def _trim(self):
+        total = sum(info["bytes"] for info in self.images.values())
+        if total <= self.max_disk_bytes:
+            return
+
+        def last_used(digest):
+            mtimes = [0]
+            for width in THUMBNAIL_WIDTHS:
+                try:
+                    mtimes.append(os.stat(self._path(digest, width)).st_mtime)
+                except OSError:
+                    pass
+            return max(mtimes)
+        for digest in sorted(self.images, key=last_used):
+            if total <= self.max_disk_bytes:
+                break
+            for width in THUMBNAIL_WIDTHS:
+                try:
+                    os.remove(self._path(digest, width))
+                except OSError:
+                    pass
+            total -= self.images.pop(digest)["bytes"]
+            self.memory.discard(digest)
+            for name in [name for name, value in self.sources.items() if value == digest]:
+                del self.sources[name]
+
+    def import_directory(self, directory):
+        # Files that cannot be read or decoded are logged and skipped.
+        added = 0
+        for entry in sorted(os.listdir(directory)):
+            if not entry.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = os.path.join(directory, entry)
+            try:
+                with open(path, "rb") as handle:
+                    self.add(source_name(entry), handle.read())
+            except (OSError, ValueError) as error:
+                # PIL's UnidentifiedImageError is an OSError.
+                log.warning("Skipped %s: %s", path, error)
+                continue
+            added += 1
+        return added
+
+    def _may_fetch(self, name):
+        failed_at = self._failed.get(name)
+        return self.allow_fetch and not (failed_at and time.monotonic() - failed_at < FETCH_RETRY_AFTER)
+
+    def fetch(self, url):
+        # Blocks for up to FETCH_TIMEOUT; the app goes through fetch_later().
+        name = source_name(url)
+        if not self._may_fetch(name):
+            return None
+        request = urllib.request.Request(url, headers={"User-Agent": "Radiology-Pocket-Guide/1.0"})
+        try:
+            with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+                data = response.read()
+            return self.add(name, data)
+        except Exception:
+            self._failed[name] = time.monotonic()
+            return None
+
+    def fetch_later(self, url):
+        # Starts a background fetch unless one for the same image is running.
+        name = source_name(url)
+        with self._lock:
+            if name in self._fetching or not self._may_fetch(name):
+                return
+            self._fetching.add(name)
+
+        def run():
+            try:
+                self.fetch(url)
+            finally:
+                with self._lock:
+                    self._fetching.discard(name)
+
+        threading.Thread(target=run, name="image-fetch", daemon=True).start()
+
+    # -------------------------------------------------------------------------
+    # Lookups
+    # -------------------------------------------------------------------------
+    def get(self, name, width=DISPLAY_WIDTH):
+        # Runs without the lock, which add() holds while it encodes: the entry
+        # is read once, and one that a background fetch trims in the meantime
+        # shows up as a missing file.
+        digest = self.sources.get(name)
+        info = self.images.get(digest) if digest is not None else None
+        if info is None:
+            return None
+        key = (digest, width)
+        data = self.memory.get(key)
+        if data is None:
+            path = self._path(digest, width, info["ext"])
+            try:
+                with open(path, "rb") as handle:
+                    data = handle.read()
+                os.utime(path)
+            except OSError:
+                return None
+            self.memory.put(key, data)
+        return data
+
+    def image_for(self, url, width=DISPLAY_WIDTH):
+        # Never waits on the network: a missing image is fetched in the
+        # background and None is returned, so the caller shows the remote URL
+        # this time and the stored copy once the fetch has finished.
+        data = self.get(source_name(url), width)
+        if data is None:
+            self.fetch_later(url)
+        return data
+
+
+default_store = ProcessDefault(ImageStore)
+
+
+# =============================================================================
+# Command Line
+# =============================================================================
+# python -m radiology_guide.images import <directory>   fill the store offline
+# python -m radiology_guide.images prefetch             fetch every mapped URL once
+# python -m radiology_guide.images stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m radiology_guide.images",
+                                     description="Manage the local image store.")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="image store directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="import every image file from a directory")
+    import_parser.add_argument("directory")
+    commands.add_parser("prefetch", help="download every mapped image into the store")
+    commands.add_parser("stats", help="show what the store holds")
+    args = parser.parse_args(argv)
+
+    store = ImageStore(args.store, allow_fetch=args.command == "prefetch")
+    if args.command == "import":
+        print(f"Imported {store.import_directory(args.directory)} images into {store.root}")
+    elif args.command == "prefetch":
+        missing = 0
+        for url, _ in list(LESION_IMAGES.values()) + list(TOPIC_IMAGES.values()):
+            if store.get(source_name(url)) is None and store.fetch(url) is None:
+                print(f"Could not fetch {url}", file=sys.stderr)
+                missing += 1
+        return 1 if missing else 0
+    else:
+        mapped = [source_name(url) for url, _ in list(LESION_IMAGES.values()) + list(TOPIC_IMAGES.values())]
+        print(f"Store: {store.root}")
+        print(f"Images: {len(store.images)} ({sum(info['bytes'] for info in store.images.values())} bytes)")
+        for name in mapped:
+            print(f"  {name:<40} {'ok' if name in store.sources else 'missing'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
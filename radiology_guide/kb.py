@@ -0,0 +1,407 @@
+import argparse
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from radiology_guide.util import ProcessDefault, atomic_write
+
+# =============================================================================
+# Memory-Mapped Knowledge Base
+# =============================================================================
+# A read-only, offset-indexed blob holding the topic and lesion guide content,
+# so several server worker processes can share one copy through the OS page
+# cache instead of each holding the text in its own heap:
+#
+#   python -m radiology_guide.kb build guide.kb
+#   RADIOLOGY_GUIDE_KB=guide.kb streamlit run streamlite12_app.py
+#
+# Layout (little-endian):
+#
+#   header    magic "RGKB", format version, record count, padding  (16 bytes)
+#   hashes    count x uint64, sorted 64-bit BLAKE2b digests of the keys
+#   offsets   count x uint64, record start, parallel to hashes
+#   lengths   count x uint64, record length, parallel to hashes
+#   digests   count x uint64, 64-bit BLAKE2b digest of the value, parallel
+#             to hashes
+#   records   uint32 key length, UTF-8 key, zero padding, value
+#
+# Records and their values start at multiples of 8 bytes, so a value that
+# holds numbers can be read in place as an array.
+#
+# The file is mapped with mmap and the tables are memoryviews over the
+# mapping, so opening the store reads nothing up front and a lookup is a
+# binary search plus a slice: view() returns a memoryview of the value
+# without copying it. Pages are only faulted in when touched and are shared
+# by every process that maps the file. changed_keys() compares two versions
+# of a store through the hash and digest tables, reading only the keys of
+# the records that differ.
+#
+# Keys are tuples of strings. The guide content is stored as UTF-8 text:
+#
+#   ("topic", topic_mode, selection)      a topic block
+#   ("topic-fallback", topic_mode)        the block of topics without one
+#   ("lesion", rule_id)                   a rule's pre-rendered body
+#
+# next to the tables a worker would otherwise build in its own heap:
+#
+#   ("rule", rule_id)                     the rule's fields except its body,
+#                                         as JSON
+#   ("rule-bucket", modality, organ, lesion_type)
+#                                         the ids of the rules of one bucket
+#                                         of the rule index, in match order
+#   ("rules",), ("rule-patterns",)        every rule id in file order, and
+#                                         the wildcard patterns in use
+#   ("search", ...)                       the search index (see
+#                                         SearchIndex.store_items()), partly
+#                                         as sorted tables (pack_table())
+
+MAGIC = b"RGKB"
+FORMAT_VERSION = 3
+HEADER = struct.Struct("<4sII4x")
+KEY_LENGTH = struct.Struct("<I")
+KEY_SEPARATOR = "\x1f"
+
+DEFAULT_KB_PATH = os.environ.get("RADIOLOGY_GUIDE_KB")
+
+# Rule fields kept in the ("rule", rule_id) records; sections and notes live
+# in the record of each rule's pre-rendered body.
+RULE_INDEX_FIELDS = ("id", "modality", "organ", "lesion_type", "priority", "when", "title")
+
+
+def encode_key(key):
+    return KEY_SEPARATOR.join(key).encode("utf-8")
+
+
+TABLES = ("hashes", "offsets", "lengths", "digests")
+
+
+def digest64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def padding(size):
+    # Zero bytes that bring `size` to a multiple of 8.
+    return -size % 8
+
+
+def uint64s(data):
+    # A little-endian uint64 table of the file as a sequence of ints.
+    if sys.byteorder == "little":
+        return data.cast("Q")
+    table = array("Q", data)
+    table.byteswap()
+    return table
+
+
+def write_store(path, items):
+    # `items` is an iterable of (key tuple, text or bytes) pairs.
+    records = []
+    for key, value in items:
+        encoded = encode_key(key)
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        records.append((digest64(encoded), encoded, value))
+    records.sort(key=lambda record: (record[0], record[1]))
+    count = len(records)
+    offsets = array("Q")
+    lengths = array("Q")
+    position = HEADER.size + len(TABLES) * 8 * count
+    for _, encoded, value in records:
+        offsets.append(position)
+        lengths.append(KEY_LENGTH.size + len(encoded) + padding(KEY_LENGTH.size + len(encoded)) + len(value))
+        position += lengths[-1] + padding(lengths[-1])
+    hashes = array("Q", (record[0] for record in records))
+    digests = array("Q", (digest64(record[2]) for record in records))
+    if sys.byteorder != "little":
+        for table in (hashes, offsets, lengths, digests):
+            table.byteswap()
+
+    # Readers that already mapped the old file keep using it until reopened.
+    with atomic_write(path, "wb") as handle:
+        handle.write(HEADER.pack(MAGIC, FORMAT_VERSION, count))
+        handle.write(hashes.tobytes())
+        handle.write(offsets.tobytes())
+        handle.write(lengths.tobytes())
+        handle.write(digests.tobytes())
+        for _, encoded, value in records:
+            handle.write(KEY_LENGTH.pack(len(encoded)))
+            handle.write(encoded)
+            handle.write(bytes(padding(KEY_LENGTH.size + len(encoded))))
+            handle.write(value)
+            handle.write(bytes(padding(len(value))))
+    return count
+
+
+class KnowledgeBase:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._data = memoryview(self._map)
+        magic, version, count = HEADER.unpack_from(self._data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} knowledge base")
+        self.count = count
+        tables = []
+        for number in range(len(TABLES)):
+            start = HEADER.size + number * 8 * count
+            tables.append(uint64s(self._data[start:start + 8 * count]))
+        self.hashes, self.offsets, self.lengths, self.digests = tables
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, key):
+        return self.view(key) is not None
+
+    def _record(self, position):
+        # (encoded key, value) memoryviews of the record at `position`.
+        start = self.offsets[position]
+        key_end = start + KEY_LENGTH.size + KEY_LENGTH.unpack_from(self._data, start)[0]
+        value_start = key_end + padding(key_end)
+        return self._data[start + KEY_LENGTH.size:key_end], self._data[value_start:start + self.lengths[position]]
+
+    def view(self, key):
+        # Zero-copy: the returned memoryview points into the mapping, which
+        # stays mapped for as long as the view is alive.
+        encoded = encode_key(key)
+        digest = digest64(encoded)
+        position = bisect.bisect_left(self.hashes, digest)
+        while position < self.count and self.hashes[position] == digest:
+            stored, value = self._record(position)
+            if stored == encoded:
+                return value
+            position += 1
+        return None
+
+    def key_at(self, position):
+        return tuple(str(self._record(position)[0], "utf-8").split(KEY_SEPARATOR))
+
+    def items(self):
+        # (key tuple, value memoryview) for every record, in hash order.
+        for position in range(self.count):
+            key, value = self._record(position)
+            yield tuple(str(key, "utf-8").split(KEY_SEPARATOR)), value
+
+    def get(self, key, default=None):
+        value = self.view(key)
+        if value is None:
+            return default
+        return str(value, "utf-8")
+
+    def close(self):
+        # Drops the store's references to the mapping rather than closing it:
+        # views, tables and arrays handed out by the store keep pointing into
+        # the file, and it is unmapped once the last of them is gone. The
+        # store itself cannot be read after this.
+        self.hashes = self.offsets = self.lengths = self.digests = None
+        self._data = self._map = None
+
+
+def changed_keys(old, new):
+    # Keys of the records added, removed or rewritten between two stores.
+    # Records are matched by key hash and compared by value digest with
+    # vectorized lookups over the tables, so keys are only read for the
+    # records that differ and for the rare ones whose key hash is shared
+    # within a store. (A removed and an added key with the same 64-bit hash
+    # and the same value would go unnoticed.)
+    import numpy as np
+
+    def repeated(hashes):
+        return hashes[1:][hashes[1:] == hashes[:-1]]
+
+    changed = set()
+    for store, other in ((new, old), (old, new)):
+        hashes = np.asarray(store.hashes, dtype=np.uint64)
+        digests = np.asarray(store.digests, dtype=np.uint64)
+        other_hashes = np.asarray(other.hashes, dtype=np.uint64)
+        other_digests = np.asarray(other.digests, dtype=np.uint64)
+        if not len(other_hashes):
+            changed.update(store.key_at(position) for position in range(store.count))
+            continue
+        positions = np.minimum(np.searchsorted(other_hashes, hashes), len(other_hashes) - 1)
+        same = (other_hashes[positions] == hashes) & (other_digests[positions] == digests)
+        shared = np.isin(hashes, np.concatenate((repeated(hashes), repeated(other_hashes))))
+        changed.update(store.key_at(position) for position in np.flatnonzero(~same & ~shared))
+        for position in np.flatnonzero(shared):
+            key = store.key_at(position)
+            if store.view(key) != other.view(key):
+                changed.add(key)
+    return changed
+
+
+# =============================================================================
+# Sorted Tables
+# =============================================================================
+# A sorted table packs (string, bytes) pairs into the value of one record,
+# ordered by key, so a worker can look keys up and scan them in order in
+# place instead of loading a dict:
+#
+#   count        uint64
+#   key bounds   (count + 1) x uint64, offset of each key in the key bytes
+#   value bounds (count + 1) x uint64, offset of each value in the value bytes
+#   key bytes    the UTF-8 keys back to back, zero padding to a multiple of 8
+#   value bytes  the values back to back
+#
+# UTF-8 byte order is code point order, so the keys are in str sort order.
+
+
+def pack_table(items):
+    # `items` is an iterable of (str, bytes) pairs with unique keys.
+    items = sorted((key.encode("utf-8"), value) for key, value in items)
+    key_bounds = array("Q", [0])
+    value_bounds = array("Q", [0])
+    for key, value in items:
+        key_bounds.append(key_bounds[-1] + len(key))
+        value_bounds.append(value_bounds[-1] + len(value))
+    if sys.byteorder != "little":
+        key_bounds.byteswap()
+        value_bounds.byteswap()
+    keys = b"".join(key for key, _ in items)
+    return b"".join([struct.pack("<Q", len(items)), key_bounds.tobytes(), value_bounds.tobytes(),
+                     keys, bytes(padding(len(keys)))] + [value for _, value in items])
+
+
+class SortedTable:
+    def __init__(self, data):
+        # `data` is a memoryview of a value written by pack_table().
+        count = uint64s(data[:8])[0]
+        bounds = 8 * (count + 1)
+        self.count = count
+        self.key_bounds = uint64s(data[8:8 + bounds])
+        self.value_bounds = uint64s(data[8 + bounds:8 + 2 * bounds])
+        keys_start = 8 + 2 * bounds
+        keys_end = keys_start + self.key_bounds[count]
+        self._keys = data[keys_start:keys_end]
+        values_start = keys_end + padding(keys_end)
+        self._values = data[values_start:values_start + self.value_bounds[count]]
+
+    def __len__(self):
+        return self.count
+
+    def _key(self, position):
+        return self._keys[self.key_bounds[position]:self.key_bounds[position + 1]]
+
+    def key(self, position):
+        return str(self._key(position), "utf-8")
+
+    def value(self, position):
+        return self._values[self.value_bounds[position]:self.value_bounds[position + 1]]
+
+    def position(self, key):
+        # The position of the first key that is not less than `key`.
+        encoded = key.encode("utf-8")
+        keys, bounds = self._keys, self.key_bounds
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if keys[bounds[middle]:bounds[middle + 1]].tobytes() < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def find(self, key):
+        # The position of `key`, or -1 if the table does not hold it.
+        position = self.position(key)
+        if position < self.count and self._key(position) == key.encode("utf-8"):
+            return position
+        return -1
+
+    def get(self, key, default=None):
+        position = self.find(key)
+        return default if position < 0 else self.value(position)
+
+
+# =============================================================================
+# Building From the Guide Sources
+# =============================================================================
+def guide_items(rules_path=None):
+    from radiology_guide.guides import TOPIC_MODES
+    from radiology_guide.rules import DEFAULT_RULES_PATH, Rule, RuleEngine, read_rule_specs
+    from radiology_guide.search import SearchIndex, guide_documents
+
+    blocks = {}
+    for topic_mode, (_, mode_blocks, fallback) in TOPIC_MODES.items():
+        yield ("topic-fallback", topic_mode), fallback
+        for selection, block in mode_blocks.items():
+            blocks[topic_mode, selection] = block
+            yield ("topic", topic_mode, selection), block
+    rules = []
+    seen = set()
+    for spec in read_rule_specs(rules_path or DEFAULT_RULES_PATH):
+        rule = Rule(spec)
+        if not rule.id or rule.id in seen:
+            raise ValueError(f"Every rule needs a unique id to be stored; got {rule.id!r}")
+        seen.add(rule.id)
+        rules.append(rule)
+        yield ("rule", rule.id), json.dumps({field: spec[field] for field in RULE_INDEX_FIELDS if field in spec},
+                                            ensure_ascii=False)
+        yield ("lesion", rule.id), rule.body
+    engine = RuleEngine(rules)
+    yield ("rules",), json.dumps([rule.id for rule in rules], ensure_ascii=False)
+    yield ("rule-patterns",), json.dumps(engine.patterns)
+    for key, bucket in engine.index.items():
+        yield ("rule-bucket",) + key, json.dumps([rule.id for rule in bucket], ensure_ascii=False)
+    for item in SearchIndex(guide_documents(rules, blocks)).store_items():
+        yield item
+
+
+def build(path, rules_path=None):
+    return write_store(path, guide_items(rules_path))
+
+
+def open_default_kb():
+    # The store named by RADIOLOGY_GUIDE_KB; None when no store is configured
+    # and the built-in content is used instead.
+    if DEFAULT_KB_PATH and os.path.exists(DEFAULT_KB_PATH):
+        return KnowledgeBase(DEFAULT_KB_PATH)
+    return None
+
+
+default_kb = ProcessDefault(open_default_kb)
+
+
+# =============================================================================
+# Command Line
+# =============================================================================
+# python -m radiology_guide.kb build guide.kb
+# python -m radiology_guide.kb get guide.kb topic "By Section" Anatomy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m radiology_guide.kb",
+                                     description="Build or inspect a memory-mapped knowledge base.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="write the guide content to a store")
+    build_parser.add_argument("path")
+    build_parser.add_argument("--rules", default=None, help="lesion rules file (default: the bundled rules)")
+    get_parser = commands.add_parser("get", help="print one record")
+    get_parser.add_argument("path")
+    get_parser.add_argument("key", nargs="+", help="key parts, e.g. lesion ct-brain-mass")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        count = build(args.path, args.rules)
+        print(f"Wrote {count} records ({os.path.getsize(args.path)} bytes) to {args.path}")
+        return 0
+    store = KnowledgeBase(args.path)
+    try:
+        value = store.get(tuple(args.key))
+    finally:
+        store.close()
+    if value is None:
+        print(f"No record for {tuple(args.key)!r}", file=sys.stderr)
+        return 1
+    sys.stdout.write(value)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+import bisect
+import contextlib
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+
+from radiology_guide.util import ProcessDefault, atomic_write
+
+# =============================================================================
+# Runtime Instrumentation
+# =============================================================================
+# Opt-in timing of the phases of each rerun. Set RADIOLOGY_GUIDE_METRICS=1 to
+# enable it; everything below is then aggregated in-process into fixed-bucket
+# histograms and exported as
+#
+#   <dir>/metrics.prom     Prometheus text format, rewritten every few seconds
+#   <dir>/trace.jsonl      one JSON line per rerun, rotated by size
+#   :<port>/metrics        optional HTTP endpoint (RADIOLOGY_GUIDE_METRICS_PORT)
+#
+# where <dir> is RADIOLOGY_GUIDE_METRICS_DIR (default ./metrics). When
+# disabled, span() hands back one shared no-op context manager and the other
+# calls return immediately, so the instrumented code pays a function call.
+
+ENABLED = os.environ.get("RADIOLOGY_GUIDE_METRICS", "").lower() in ("1", "true", "yes", "on")
+METRICS_DIR = os.environ.get("RADIOLOGY_GUIDE_METRICS_DIR", "metrics")
+METRICS_PORT = os.environ.get("RADIOLOGY_GUIDE_METRICS_PORT")
+
+EXPORT_INTERVAL = 10
+TRACE_MAX_BYTES = 10 * 1024 * 1024
+TRACE_BACKUPS = 5
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+NULL_SPAN = contextlib.nullcontext()
+
+_local = threading.local()
+_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+# (metric name, sorted label items) -> Histogram
+_histograms = {}
+
+
+def _observe(name, buckets, value, labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+
+# =============================================================================
+# Recording
+# =============================================================================
+class Trace:
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.spans = []
+        self.sizes = {}
+
+    def label(self, **labels):
+        self.labels.update(labels)
+
+
+@contextlib.contextmanager
+def _span(name, labels):
+    trace = getattr(_local, "trace", None)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if trace is not None:
+            trace.spans.append((name, elapsed))
+            labels = dict(trace.labels, **labels)
+        _observe("radiology_guide_phase_seconds", SECONDS_BUCKETS, elapsed, dict(labels, phase=name))
+
+
+def span(name, **labels):
+    if not ENABLED:
+        return NULL_SPAN
+    return _span(name, labels)
+
+
+@contextlib.contextmanager
+def _rerun(name, labels):
+    if getattr(_local, "trace", None) is not None:
+        # Nested inside a full rerun (e.g. a fragment running as part of it).
+        with _span(name, labels):
+            yield
+        return
+    trace = _local.trace = Trace(name, labels)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.trace = None
+        elapsed = time.perf_counter() - start
+        _observe("radiology_guide_rerun_seconds", SECONDS_BUCKETS, elapsed, dict(trace.labels, kind=name))
+        _finish(trace, elapsed)
+
+
+def rerun(name, **labels):
+    # Wraps one script run (or fragment run); spans recorded inside it are
+    # labelled with its labels and written to the trace as one line.
+    if not ENABLED:
+        return NULL_SPAN
+    return _rerun(name, labels)
+
+
+def label(**labels):
+    # Adds labels (e.g. the selected modality) to the current rerun once known.
+    if not ENABLED:
+        return
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.label(**labels)
+
+
+def record_size(name, text):
+    # Byte size of a payload sent to the browser, e.g. the st.text_area value.
+    if not ENABLED:
+        return
+    size = len(text.encode("utf-8"))
+    trace = getattr(_local, "trace", None)
+    labels = {}
+    if trace is not None:
+        trace.sizes[name] = size
+        labels = dict(trace.labels)
+    _observe("radiology_guide_payload_bytes", BYTES_BUCKETS, size, dict(labels, payload=name))
+
+
+# =============================================================================
+# Export
+# =============================================================================
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(items):
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+def prometheus_text():
+    lines = []
+    with _lock:
+        histograms = sorted(_histograms.items())
+    seen = set()
+    for (name, items), histogram in histograms:
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_labels_text(items + (('le', le),))} {cumulative}")
+        lines.append(f"{name}_sum{_labels_text(items)} {histogram.total!r}")
+        lines.append(f"{name}_count{_labels_text(items)} {histogram.count}")
+
+    from radiology_guide.guides import lesion_guide_cache, topic_guide_cache
+
+    for metric, kind in (("hits", "counter"), ("misses", "counter"), ("size", "gauge"), ("hit_rate", "gauge")):
+        name = f"radiology_guide_render_cache_{metric}" + ("_total" if kind == "counter" else "")
+        lines.append(f"# TYPE {name} {kind}")
+        for cache_name, cache in (("lesion", lesion_guide_cache), ("topic", topic_guide_cache)):
+            lines.append(f'{name}{{cache="{cache_name}"}} {cache.stats()[metric]!r}')
+    return "\n".join(lines) + "\n"
+
+
+class Exporter:
+    def __init__(self, directory=METRICS_DIR, port=METRICS_PORT):
+        os.makedirs(directory, exist_ok=True)
+        self.prometheus_path = os.path.join(directory, "metrics.prom")
+        self.last_export = 0.0
+        self.trace_log = logging.getLogger("radiology_guide.trace")
+        self.trace_log.propagate = False
+        self.trace_log.setLevel(logging.INFO)
+        if not self.trace_log.handlers:
+            handler = logging.handlers.RotatingFileHandler(
+                os.path.join(directory, "trace.jsonl"), maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUPS,
+                encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.trace_log.addHandler(handler)
+        self.server = None
+        if port:
+            try:
+                self.serve(int(port))
+            except OSError as error:
+                # With several server workers only the first binds the port;
+                # the others keep exporting to files.
+                logging.getLogger(__name__).warning("Metrics endpoint not started on port %s: %s", port, error)
+
+    def write_trace(self, trace, elapsed):
+        self.trace_log.info(json.dumps({
+            "ts": round(time.time(), 3),
+            "kind": trace.name,
+            "labels": trace.labels,
+            "duration_ms": round(elapsed * 1000, 3),
+            "spans": [{"name": name, "ms": round(seconds * 1000, 3)} for name, seconds in trace.spans],
+            "bytes": trace.sizes,
+        }, ensure_ascii=False))
+
+    def maybe_export(self):
+        now = time.monotonic()
+        if now - self.last_export < EXPORT_INTERVAL:
+            return
+        self.last_export = now
+        with atomic_write(self.prometheus_path) as handle:
+            handle.write(prometheus_text())
+
+    def serve(self, port):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+        threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+
+
+exporter = ProcessDefault(Exporter)
+
+
+def _finish(trace, elapsed):
+    try:
+        current = exporter()
+        current.write_trace(trace, elapsed)
+        current.maybe_export()
+    except OSError:
+        logging.getLogger(__name__).exception("Could not export metrics")
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
@@ -0,0 +1,94 @@
+# =============================================================================
+# Sidebar Option Tables
+# =============================================================================
+# Static choices offered by the app. They are built once at import and shared
+# by every rerun and session, and by the batch, export and benchmark tools
+# that enumerate the same combinations.
+
+GUIDE_MODES = ("Lesion Analysis", "Radiology Topics")
+
+# =============================================================================
+# Lesion Analysis
+# =============================================================================
+MODALITY_OPTIONS = ("X-Ray", "CT", "MRI", "Ultrasound", "Nuclear Medicine")
+
+# Organ/System options based on modality
+ORGAN_OPTIONS = {
+    "X-Ray": ("Chest", "Skeletal", "Abdomen", "Head/Neck", "Spine"),
+    "CT": ("Brain", "Chest", "Abdomen/Pelvis", "Musculoskeletal", "Vascular"),
+    "MRI": ("Brain", "Spine", "Musculoskeletal", "Abdomen", "Pelvis"),
+    "Ultrasound": ("Abdomen", "Pelvis", "Thyroid", "Musculoskeletal"),
+    "Nuclear Medicine": ("Bone", "Cardiac", "Oncology"),
+}
+
+LESION_TYPE_OPTIONS = (
+    "Mass", "Cystic Lesion", "Calcification", "Hemorrhage", "Inflammatory", "Vascular Malformation", "Degenerative",
+)
+
+MARGIN_OPTIONS = ("Well-circumscribed", "Ill-defined", "Spiculated", "Infiltrative", "Lobulated")
+SHAPE_OPTIONS = ("Round/Oval", "Irregular", "Angular", "Multilobulated")
+INTERNAL_OPTIONS = ("Homogeneous", "Heterogeneous", "Necrotic", "Cystic areas", "Solid")
+CALCIFICATION_OPTIONS = ("None", "Central", "Diffuse", "Punctate", "Stippled", "Popcorn")
+VASCULARITY_OPTIONS = ("None", "Low", "Moderate", "High", "Flow voids on MRI")
+SIGNAL_OPTIONS = (
+    "Hyperdense/Hyperattenuating", "Hypodense/Hypoattenuating", "Isodense/Isoattenuating",
+    "T1 Hyperintense", "T1 Hypointense", "T2 Hyperintense", "T2 Hypointense", "Mixed",
+)
+ENHANCEMENT_OPTIONS = (
+    "None", "Homogeneous", "Heterogeneous", "Ring-enhancing", "Peripheral enhancement", "Progressive", "Washout",
+    "Centripetal",
+)
+
+# Lesion characteristics keyed by the names the rule engine and scorer use.
+CHARACTERISTIC_OPTIONS = {
+    "margin": MARGIN_OPTIONS,
+    "shape": SHAPE_OPTIONS,
+    "internal": INTERNAL_OPTIONS,
+    "calcification": CALCIFICATION_OPTIONS,
+    "vascularity": VASCULARITY_OPTIONS,
+    "signal": SIGNAL_OPTIONS,
+    "enhancement": ENHANCEMENT_OPTIONS,
+}
+
+DEFAULT_LESION_SIZE = "e.g., 2.5"
+DEFAULT_ADDITIONAL_FEATURES = "e.g., diffusion restriction, hemorrhagic components, edema, etc."
+
+# =============================================================================
+# Radiology Topics
+# =============================================================================
+SECTION_OPTIONS = (
+    "Anatomy", "Approach", "Artificial Intelligence", "Classifications", "Gamuts",
+    "Imaging Technology", "Interventional Radiology", "Mnemonics", "Pathology",
+    "Radiography", "Signs", "Staging", "Syndromes",
+)
+
+SYSTEM_OPTIONS = (
+    "Breast", "Cardiac", "Central Nervous System", "Chest", "Forensic", "Gastrointestinal",
+    "Gynaecology", "Haematology", "Head & Neck", "Hepatobiliary", "Interventional",
+    "Musculoskeletal", "Obstetrics", "Oncology", "Paediatrics", "Spine", "Trauma",
+    "Urogenital", "Vascular",
+)
+
+CASE_OPTIONS = SYSTEM_OPTIONS
+
+# Topic mode -> (selectbox label, options)
+TOPIC_OPTIONS = {
+    "By Section": ("Select Section:", SECTION_OPTIONS),
+    "By System": ("Select System:", SYSTEM_OPTIONS),
+    "Cases": ("Select Case Type:", CASE_OPTIONS),
+}
+
+
+def lesion_keys():
+    # Every (modality, organ, lesion_type) the sidebar can produce.
+    for modality in MODALITY_OPTIONS:
+        for organ in ORGAN_OPTIONS[modality]:
+            for lesion_type in LESION_TYPE_OPTIONS:
+                yield modality, organ, lesion_type
+
+
+def topic_keys():
+    # Every (topic_mode, selection) the sidebar can produce.
+    for topic_mode, (_, selections) in TOPIC_OPTIONS.items():
+        for selection in selections:
+            yield topic_mode, selection
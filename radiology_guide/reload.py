@@ -0,0 +1,302 @@
+import json
+import logging
+import os
+import threading
+
+from radiology_guide import findings, kb, rules, search
+from radiology_guide.guides import lesion_guide_cache, topic_guide_cache
+from radiology_guide.options import DEFAULT_ADDITIONAL_FEATURES
+from radiology_guide.rules import WILDCARD, Rule
+from radiology_guide.util import ProcessDefault
+
+# =============================================================================
+# Hot Reload
+# =============================================================================
+# Watches the knowledge files and applies edits to a running server without a
+# restart, so sessions keep their sidebar state. Set RADIOLOGY_GUIDE_HOT_RELOAD=1
+# to start the watcher with the app; it polls the file modification times
+# every RADIOLOGY_GUIDE_RELOAD_INTERVAL seconds (default 2).
+#
+# Watched files are the lesion rules, the differentials and the findings
+# lexicon, or, when a knowledge base is configured (RADIOLOGY_GUIDE_KB), the
+# store in place of the rules. Only a file that changed is reparsed, and its new content is
+# diffed against the previous one:
+#
+#   rules          changed rules are dropped from and re-added to a copy of the
+#                  rule engine and the search index, sharing everything else
+#   differentials  the scorer is rebuilt (one vectorized pass)
+#   findings       the automaton is rebuilt; only guides whose additional
+#                  features mention a term that changed are invalidated
+#   store          the new store is diffed record by record; the engine and
+#                  the search index are opened over the tables the new store
+#                  carries, and only the guides of changed topics and rules
+#                  are invalidated
+#
+# Each new engine, index, scorer or store is built off to the side and swapped
+# in with a single assignment, so a rerun in flight sees either the old or the
+# new object, never a half-updated one. A rerun may still combine an old
+# engine with a new store or index for a moment; rules carry their own bodies
+# and search results are looked up again, so that mix renders the old or the
+# new content, not an empty one. Afterwards only the cached guides of the
+# affected (modality, organ, lesion_type) or topic keys, or those whose
+# additional features mention a changed lexicon term, are invalidated.
+
+ENABLED = os.environ.get("RADIOLOGY_GUIDE_HOT_RELOAD", "").lower() in ("1", "true", "yes", "on")
+RELOAD_INTERVAL = float(os.environ.get("RADIOLOGY_GUIDE_RELOAD_INTERVAL", "2"))
+
+log = logging.getLogger(__name__)
+
+# Serializes reloads; readers never take it.
+_swap_lock = threading.Lock()
+
+
+def file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def canonical_specs(specs):
+    # Rule id -> canonical JSON of its spec, for diffing two versions.
+    by_id = {}
+    for spec in specs:
+        rule_id = spec.get("id")
+        if not rule_id or rule_id in by_id:
+            raise ValueError(f"Hot reload needs a unique id on every rule; got {rule_id!r}")
+        by_id[rule_id] = json.dumps(spec, sort_keys=True)
+    return by_id
+
+
+def diff_specs(previous, specs):
+    # Returns (new canonical specs, ids of dropped or changed rules, changed or added specs).
+    current = canonical_specs(specs)
+    removed = [rule_id for rule_id, text in previous.items() if current.get(rule_id) != text]
+    added = [spec for spec in specs if previous.get(spec["id"]) != current[spec["id"]]]
+    return current, removed, added
+
+
+def key_matches(pattern, key):
+    return all(part == WILDCARD or part == value for part, value in zip(pattern, key))
+
+
+def indexed_documents(keys):
+    # The search Documents of `keys` as the current content has them; read
+    # before the content is replaced so the index can drop what it indexed.
+    documents = (search.guide_document(key) for key in keys)
+    return [document for document in documents if document is not None]
+
+
+def apply_rule_changes(removed, added_specs):
+    # `removed` are ids of rules that were dropped or changed and
+    # `added_specs` the specs of changed or new rules. Returns the number of
+    # invalidated cached guides.
+    engine = rules.default_engine.value
+    if engine is None:
+        # Not loaded yet; it will be built from the new content on first use.
+        return 0
+    added = [Rule(spec) for spec in added_specs]
+    removed = set(removed)
+    patterns = {rule.key for rule in engine.rules if rule.id in removed}
+    patterns.update(rule.key for rule in added)
+    index = search.default_index.value
+    if index is not None:
+        previous = indexed_documents([("lesion", rule_id) for rule_id in removed])
+    if removed or added:
+        engine = engine.updated(removed, added)
+        rules.default_engine.value = engine
+
+    if index is not None:
+        search.default_index.value = index.updated(previous, [search.lesion_document(rule) for rule in added])
+
+    if not patterns:
+        return 0
+    return lesion_guide_cache.invalidate(lambda key: any(key_matches(pattern, key[:3]) for pattern in patterns))
+
+
+# =============================================================================
+# Watched Sources
+# =============================================================================
+class RulesSource:
+    def __init__(self, path=rules.DEFAULT_RULES_PATH):
+        self.path = path
+        self.specs = canonical_specs(rules.read_rule_specs(path))
+
+    def reload(self):
+        specs, removed, added = diff_specs(self.specs, rules.read_rule_specs(self.path))
+        invalidated = apply_rule_changes(removed, added)
+        self.specs = specs
+        changed = set(removed) | {spec["id"] for spec in added}
+        return f"{len(changed)} rules changed, {invalidated} cached guides invalidated"
+
+
+class DifferentialsSource:
+    def __init__(self, path=None):
+        from radiology_guide.scoring import DEFAULT_DIFFERENTIALS_PATH
+
+        self.path = path or DEFAULT_DIFFERENTIALS_PATH
+        self.diagnoses = self.read()
+
+    def read(self):
+        with open(self.path, encoding="utf-8") as handle:
+            data = json.load(handle)
+        diagnoses = data["diagnoses"] if isinstance(data, dict) else data
+        return {spec["name"]: spec for spec in diagnoses}
+
+    def reload(self):
+        from radiology_guide import scoring
+
+        diagnoses = self.read()
+        changed = [name for name in set(self.diagnoses) | set(diagnoses)
+                   if self.diagnoses.get(name) != diagnoses.get(name)]
+        if scoring.default_scorer.value is not None:
+            scoring.default_scorer.value = scoring.DifferentialScorer(list(diagnoses.values()))
+        self.diagnoses, previous = diagnoses, self.diagnoses
+        # A diagnosis only ranks for the organs it lists, or everywhere if it lists none.
+        organs = set()
+        for name in changed:
+            for spec in (previous.get(name), diagnoses.get(name)):
+                if spec is None:
+                    continue
+                if not spec.get("organs"):
+                    organs = None
+                    break
+                organs.update(spec["organs"])
+            if organs is None:
+                break
+        if organs is None:
+            invalidated = lesion_guide_cache.invalidate(lambda key: True)
+        elif organs:
+            invalidated = lesion_guide_cache.invalidate(lambda key: key[1] in organs)
+        else:
+            invalidated = 0
+        return f"{len(changed)} diagnoses changed, {invalidated} cached guides invalidated"
+
+
+class KnowledgeBaseSource:
+    def __init__(self, path=kb.DEFAULT_KB_PATH):
+        self.path = path
+        self.store = kb.default_kb() or kb.KnowledgeBase(path)
+
+    def reload(self):
+        store = kb.KnowledgeBase(self.path)
+        changed = kb.changed_keys(self.store, store)
+        # Rules whose fields or body changed; the buckets and the rule list
+        # are derived from them.
+        rule_ids = {key[1] for key in changed if key[0] in ("rule", "lesion")}
+        topics = {key[1:] for key in changed if key[0] == "topic"}
+        fallbacks = {key[1] for key in changed if key[0] == "topic-fallback"}
+        engine = rules.default_engine.value
+        patterns = set()
+        if engine is not None:
+            previous, engine = engine, rules.RuleEngine.from_store(store)
+            for current in (previous, engine):
+                patterns.update(rule.key for rule in map(current.by_id.get, rule_ids) if rule is not None)
+
+        # The engine goes first: its rules carry their bodies from the store
+        # they were read from, so a rerun still resolving with the old engine
+        # renders the old body, and one that picks up the new engine never
+        # finds a rule whose body the old store lacks. The previous store is
+        # not closed: renders in flight may still read from it, and it is
+        # unmapped once the last reference goes away.
+        if engine is not None:
+            rules.default_engine.value = engine
+        kb.default_kb.value = store
+        self.store = store
+        # The new store carries the index of its own content, so nothing is
+        # re-indexed here.
+        if search.default_index.value is not None and changed:
+            index = search.SearchIndex.from_store(store)
+            search.default_index.value = index if index is not None else search.build_index()
+
+        invalidated = 0
+        if patterns:
+            invalidated += lesion_guide_cache.invalidate(
+                lambda key: any(key_matches(pattern, key[:3]) for pattern in patterns))
+        if topics or fallbacks:
+            invalidated += topic_guide_cache.invalidate(lambda key: key in topics or key[0] in fallbacks)
+        return f"{len(changed)} records changed, {invalidated} cached guides invalidated"
+
+
+class FindingsSource:
+    def __init__(self, path=findings.DEFAULT_LEXICON_PATH):
+        self.path = path
+        self.lexicon = findings.read_lexicon(path)
+
+    def reload(self):
+        lexicon = findings.read_lexicon(self.path)
+        extractor = findings.lexicon_extractor(lexicon)
+        terms = findings.changed_terms(self.lexicon, lexicon)
+        if findings.default_extractor.value is not None:
+            findings.default_extractor.value = extractor
+        self.lexicon = lexicon
+        # Free text that mentions none of the changed terms is extracted the
+        # same way by both lexicons; the placeholder text is never extracted.
+        mentions = findings.FindingExtractor({term: () for term in terms})
+        invalidated = lesion_guide_cache.invalidate(
+            lambda key: key[11] and key[11] != DEFAULT_ADDITIONAL_FEATURES
+            and bool(mentions.matches(findings.tokenize(key[11]))))
+        return f"{len(terms)} terms changed, {invalidated} cached guides invalidated"
+
+
+def default_sources():
+    if kb.default_kb() is not None:
+        return [KnowledgeBaseSource(), DifferentialsSource(), FindingsSource()]
+    return [RulesSource(), DifferentialsSource(), FindingsSource()]
+
+
+# =============================================================================
+# Watcher
+# =============================================================================
+class ContentWatcher:
+    def __init__(self, sources, interval=RELOAD_INTERVAL):
+        self.sources = sources
+        self.interval = interval
+        self._stamps = {source.path: file_stamp(source.path) for source in sources}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self):
+        # Reloads every source whose file changed; returns [(path, summary)].
+        reloaded = []
+        for source in self.sources:
+            stamp = file_stamp(source.path)
+            if stamp is None or stamp == self._stamps[source.path]:
+                continue
+            self._stamps[source.path] = stamp
+            try:
+                with _swap_lock:
+                    summary = source.reload()
+            except Exception:
+                # A half-saved or invalid file keeps the previous content
+                # live; the next save is picked up again.
+                log.exception("Could not reload %s", source.path)
+                continue
+            log.info("Reloaded %s: %s", source.path, summary)
+            reloaded.append((source.path, summary))
+        return reloaded
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="content-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+
+def start_watcher():
+    # Only when RADIOLOGY_GUIDE_HOT_RELOAD is set; None otherwise.
+    if not ENABLED:
+        return None
+    watcher = ContentWatcher(default_sources())
+    watcher.start()
+    return watcher
+
+
+default_watcher = ProcessDefault(start_watcher)
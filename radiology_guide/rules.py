@@ -0,0 +1,244 @@
+import json
+import os
+
+from radiology_guide.util import ProcessDefault
+
+# =============================================================================
+# Lesion Rule Engine
+# =============================================================================
+# Rules are declared in a JSON (or YAML) file and compiled once into a hash
+# index on (modality, organ, lesion_type). Each bucket holds the rules for one
+# key, already sorted so that the first rule whose secondary filters match the
+# query is the best one. Resolving a query therefore costs a handful of dict
+# probes plus a walk over a single bucket, whatever the total rule count.
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), "data", "lesion_rules.json")
+
+WILDCARD = "*"
+
+# Secondary filters a rule may place in its "when" block, matching the
+# "Lesion Characteristics" fields of the sidebar.
+CHARACTERISTICS = ("margin", "shape", "internal", "calcification", "vascularity", "signal", "enhancement")
+
+# Conditions on a set of values rather than one value; the condition holds
+# when any listed value is in the set. "finding" is the set of findings
+# extracted from the additional features text (see radiology_guide.findings).
+SET_CONDITIONS = ("finding",)
+CONDITIONS = CHARACTERISTICS + SET_CONDITIONS
+
+# Wildcard patterns probed for a query, most specific first. A 1 keeps the
+# queried value for that position, a 0 replaces it with the wildcard.
+PROBE_PATTERNS = (
+    (1, 1, 1),
+    (1, 1, 0), (1, 0, 1), (0, 1, 1),
+    (1, 0, 0), (0, 1, 0), (0, 0, 1),
+    (0, 0, 0),
+)
+
+
+class Rule:
+    __slots__ = ("id", "key", "priority", "conditions", "title", "sections", "notes", "body")
+
+    def __init__(self, spec, body=None):
+        self.id = spec.get("id")
+        self.key = (spec.get("modality", WILDCARD), spec.get("organ", WILDCARD), spec.get("lesion_type", WILDCARD))
+        self.priority = spec.get("priority", 0)
+        conditions = []
+        for name, values in sorted(spec.get("when", {}).items()):
+            if name not in CONDITIONS:
+                raise ValueError(f"Rule {self.id!r} has an unknown condition {name!r}")
+            if isinstance(values, str):
+                values = [values]
+            conditions.append((name, frozenset(values)))
+        self.conditions = tuple(conditions)
+        self.title = spec["title"]
+        self.sections = tuple((section["heading"], tuple(section["items"])) for section in spec.get("sections", ()))
+        self.notes = tuple(spec.get("notes", ()))
+        # The markdown body is fixed per rule, so it is rendered once here,
+        # unless it is passed in already rendered (from a knowledge base).
+        self.body = self.render() if body is None else body
+
+    def matches(self, characteristics):
+        for name, allowed in self.conditions:
+            if name in SET_CONDITIONS:
+                if allowed.isdisjoint(characteristics.get(name, ())):
+                    return False
+            elif characteristics.get(name) not in allowed:
+                return False
+        return True
+
+    def render(self):
+        parts = [f"### {self.title}\n\n"]
+        for heading, items in self.sections:
+            parts.append(f"**{heading}:**\n")
+            parts.extend(f"- {item}\n" for item in items)
+            parts.append("\n")
+        if self.notes:
+            parts.extend(f"{note}\n" for note in self.notes)
+            parts.append("\n")
+        return "".join(parts)
+
+    def __repr__(self):
+        return f"Rule({self.id!r}, key={self.key!r})"
+
+
+class RuleEngine:
+    def __init__(self, rules=()):
+        self.rules = []
+        self.index = {}
+        # Rule id -> rule, for rules that have an id.
+        self.by_id = {}
+        self.patterns = ()
+        self.extend(rules)
+
+    def extend(self, rules):
+        touched = set()
+        for rule in rules:
+            if not isinstance(rule, Rule):
+                rule = Rule(rule)
+            self.rules.append(rule)
+            self.index.setdefault(rule.key, []).append(rule)
+            if rule.id is not None:
+                self.by_id[rule.id] = rule
+            touched.add(rule.key)
+        # More specific and higher-priority rules come first in their bucket,
+        # so resolve() can stop at the first match.
+        for key in touched:
+            self.index[key].sort(key=lambda rule: (-rule.priority, -len(rule.conditions)))
+        # Only probe the wildcard patterns some rule actually uses.
+        used = {tuple(int(part != WILDCARD) for part in key) for key in self.index}
+        self.patterns = tuple(pattern for pattern in PROBE_PATTERNS if pattern in used)
+
+    def updated(self, removed=(), added=()):
+        # Returns a new engine without the rules whose ids are in `removed` and
+        # with `added` appended. Only the buckets those rules live in are
+        # rebuilt; the others are shared, and this engine is left untouched so
+        # readers holding it keep a consistent view.
+        removed = frozenset(removed)
+        added = [rule if isinstance(rule, Rule) else Rule(rule) for rule in added]
+        touched = {rule.key for rule in self.rules if rule.id in removed}
+        touched.update(rule.key for rule in added)
+        engine = RuleEngine()
+        engine.rules = [rule for rule in self.rules if rule.id not in removed]
+        engine.index = dict(self.index)
+        engine.by_id = dict(self.by_id)
+        for rule_id in removed:
+            engine.by_id.pop(rule_id, None)
+        for key in touched:
+            bucket = [rule for rule in engine.index.get(key, ()) if rule.id not in removed]
+            if bucket:
+                engine.index[key] = bucket
+            else:
+                engine.index.pop(key, None)
+        engine.extend(added)
+        return engine
+
+    @classmethod
+    def from_store(cls, store):
+        # An engine over the rule tables of a knowledge base (see
+        # radiology_guide.kb), which builds the rules of a bucket when a query
+        # probes it and keeps none of them. It cannot be extended or updated;
+        # a reloaded store gets an engine of its own.
+        engine = cls()
+        engine.rules = engine.by_id = StoredRules(store)
+        engine.index = StoredBuckets(engine.by_id)
+        engine.patterns = tuple(tuple(pattern) for pattern in json.loads(store.get(("rule-patterns",), "[]")))
+        return engine
+
+    def __len__(self):
+        return len(self.rules)
+
+    def candidates(self, modality, organ, lesion_type):
+        query = (modality, organ, lesion_type)
+        for pattern in self.patterns:
+            key = tuple(value if keep else WILDCARD for value, keep in zip(query, pattern))
+            bucket = self.index.get(key)
+            if bucket:
+                yield bucket
+
+    def resolve(self, modality, organ, lesion_type, **characteristics):
+        for name in characteristics:
+            if name not in CONDITIONS:
+                raise TypeError(f"Unknown lesion characteristic {name!r}")
+        for bucket in self.candidates(modality, organ, lesion_type):
+            for rule in bucket:
+                if rule.matches(characteristics):
+                    return rule
+        return None
+
+
+class StoredRules:
+    # The rules of a knowledge base, both as the rule list of an engine
+    # (iterating in file order) and as its rule id -> rule lookup. A rule is
+    # built from its ("rule", id) record with the body of its ("lesion", id)
+    # record, so the body always comes from the same store as the rule.
+    def __init__(self, store):
+        self.store = store
+        self.count = len(json.loads(store.get(("rules",), "[]")))
+
+    def get(self, rule_id, default=None):
+        spec = self.store.get(("rule", rule_id))
+        if spec is None:
+            return default
+        return Rule(json.loads(spec), body=self.store.get(("lesion", rule_id), ""))
+
+    def __getitem__(self, rule_id):
+        rule = self.get(rule_id)
+        if rule is None:
+            raise KeyError(rule_id)
+        return rule
+
+    def __contains__(self, rule_id):
+        return ("rule", rule_id) in self.store
+
+    def __iter__(self):
+        for rule_id in json.loads(self.store.get(("rules",), "[]")):
+            yield self[rule_id]
+
+    def __len__(self):
+        return self.count
+
+
+class StoredBuckets:
+    # (modality, organ, lesion_type) -> the rules of that bucket, in match order.
+    def __init__(self, rules):
+        self.rules = rules
+
+    def get(self, key, default=None):
+        ids = self.rules.store.get(("rule-bucket",) + key)
+        if ids is None:
+            return default
+        return [self.rules[rule_id] for rule_id in json.loads(ids)]
+
+
+def read_rule_specs(path):
+    with open(path, encoding="utf-8") as handle:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError(f"PyYAML is required to load rules from {path}")
+            data = yaml.safe_load(handle)
+        else:
+            data = json.load(handle)
+    if isinstance(data, dict):
+        data = data.get("rules", [])
+    return data
+
+
+def load_rules(path=DEFAULT_RULES_PATH):
+    return RuleEngine(read_rule_specs(path))
+
+
+def load_default_rules():
+    # A configured knowledge base carries its own rule tables, which the
+    # engine reads in place.
+    from radiology_guide.kb import default_kb
+
+    kb = default_kb()
+    if kb is not None:
+        return RuleEngine.from_store(kb)
+    return load_rules()
+
+
+default_engine = ProcessDefault(load_default_rules)
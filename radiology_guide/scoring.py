@@ -0,0 +1,156 @@
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from radiology_guide.rules import CHARACTERISTICS
+from radiology_guide.util import ProcessDefault
+
+# =============================================================================
+# Differential Diagnosis Scoring
+# =============================================================================
+# Every diagnosis is a row of a (diagnosis x feature) weight matrix, where a
+# feature is one "field:value" choice from the sidebar (e.g. "margin:Spiculated").
+# A case is one-hot encoded over the same features, so ranking all diagnoses is
+# a single matrix-vector product and scoring a batch of cases is one matrix
+# multiply. A second (diagnosis x feature) matrix marks the organs a diagnosis
+# applies to; diagnoses outside the queried organ are masked out.
+#
+# Both matrices are stored column-major. For a single case the product with a
+# one-hot vector is computed as the sum of its few active columns, each of
+# which is then a contiguous array; this gives the same scores as W @ x at a
+# fraction of the cost once there are tens of thousands of diagnoses.
+
+DEFAULT_DIFFERENTIALS_PATH = os.path.join(os.path.dirname(__file__), "data", "differentials.json")
+
+FEATURE_FIELDS = ("modality", "organ", "lesion_type") + CHARACTERISTICS
+
+# Fields holding a set of values: the findings extracted from the additional
+# features text, and the ones it negates ("finding:edema", "absent:edema").
+FINDING_FIELDS = ("finding", "absent")
+
+# Weight given to each lesion type a diagnosis lists.
+LESION_TYPE_WEIGHT = 1.0
+
+Differential = namedtuple("Differential", ["name", "score", "contributions"])
+
+
+class DifferentialScorer:
+    def __init__(self, diagnoses):
+        self.names = []
+        self.columns = {}
+        weights = []
+        context = []
+        for row, spec in enumerate(diagnoses):
+            self.names.append(spec["name"])
+            for organ in spec.get("organs", ()):
+                context.append((row, self._column("organ:" + organ)))
+            for lesion_type in spec.get("lesion_types", ()):
+                weights.append((row, self._column("lesion_type:" + lesion_type), LESION_TYPE_WEIGHT))
+            for feature, weight in spec.get("features", {}).items():
+                field = feature.partition(":")[0]
+                if field not in FEATURE_FIELDS and field not in FINDING_FIELDS:
+                    raise ValueError(f"Diagnosis {spec['name']!r} has an unknown feature {feature!r}")
+                weights.append((row, self._column(feature), weight))
+        self.features = sorted(self.columns, key=self.columns.get)
+
+        shape = (len(self.names), len(self.features))
+        self.weights = np.zeros(shape, dtype=np.float32, order="F")
+        for row, column, weight in weights:
+            self.weights[row, column] += weight
+        self.context = np.zeros(shape, dtype=np.float32, order="F")
+        for row, column in context:
+            self.context[row, column] = 1.0
+        self.context_columns = frozenset(column for _, column in context)
+        # Diagnoses that list no organ apply everywhere.
+        self.unscoped = ~self.context.any(axis=1)
+
+    def _column(self, feature):
+        return self.columns.setdefault(feature, len(self.columns))
+
+    def __len__(self):
+        return len(self.names)
+
+    # -------------------------------------------------------------------------
+    # Encoding
+    # -------------------------------------------------------------------------
+    def active_columns(self, case):
+        columns = []
+        for field in FEATURE_FIELDS:
+            column = self.columns.get(f"{field}:{case.get(field)}")
+            if column is not None:
+                columns.append(column)
+        for field in FINDING_FIELDS:
+            for value in sorted(case.get(field, ())):
+                column = self.columns.get(f"{field}:{value}")
+                if column is not None:
+                    columns.append(column)
+        return columns
+
+    def encode(self, case, out=None):
+        x = np.zeros(len(self.features), dtype=np.float32) if out is None else out
+        x[self.active_columns(case)] = 1.0
+        return x
+
+    def encode_batch(self, cases):
+        X = np.zeros((len(cases), len(self.features)), dtype=np.float32)
+        for row, case in enumerate(cases):
+            self.encode(case, X[row])
+        return X
+
+    # -------------------------------------------------------------------------
+    # Scoring
+    # -------------------------------------------------------------------------
+    def score(self, case):
+        active = self.active_columns(case)
+        scores = np.zeros(len(self.names), dtype=np.float32)
+        in_context = self.unscoped.copy()
+        for column in active:
+            scores += self.weights[:, column]
+            if column in self.context_columns:
+                in_context |= self.context[:, column] > 0
+        scores[~in_context] = -np.inf
+        return scores, active
+
+    def score_batch(self, cases):
+        X = self.encode_batch(cases)
+        scores = X @ self.weights.T
+        in_context = (X @ self.context.T > 0) | self.unscoped
+        scores[~in_context] = -np.inf
+        return scores, X
+
+    def rank(self, case, k=5):
+        scores, active = self.score(case)
+        return self._top(scores, active, k)
+
+    def rank_batch(self, cases, k=5):
+        scores, _ = self.score_batch(cases)
+        # The active columns in the order rank() lists them, so contributions
+        # with equal weights come out in the same order.
+        return [self._top(scores[row], self.active_columns(case), k) for row, case in enumerate(cases)]
+
+    def _top(self, scores, active, k):
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        ranked = []
+        for row in top:
+            if not np.isfinite(scores[row]):
+                break
+            contributions = [(self.features[column], float(self.weights[row, column]))
+                             for column in active if self.weights[row, column]]
+            contributions.sort(key=lambda item: -abs(item[1]))
+            ranked.append(Differential(self.names[row], float(scores[row]), contributions))
+        return ranked
+
+
+def load_differentials(path=DEFAULT_DIFFERENTIALS_PATH):
+    with open(path, encoding="utf-8") as handle:
+        data = json.load(handle)
+    return DifferentialScorer(data["diagnoses"] if isinstance(data, dict) else data)
+
+
+default_scorer = ProcessDefault(load_differentials)
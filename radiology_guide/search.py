@@ -0,0 +1,646 @@
+import argparse
+import bisect
+import heapq
+import json
+import math
+import os
+import re
+import sys
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from radiology_guide.kb import KEY_SEPARATOR, KnowledgeBase, SortedTable, pack_table, write_store
+from radiology_guide.util import ProcessDefault
+
+# =============================================================================
+# Full-Text Search
+# =============================================================================
+# An in-memory inverted index over every topic and lesion guide, ranked with
+# BM25. Query terms that are not in the vocabulary are expanded to the terms
+# they prefix (for search-as-you-type) and to terms one edit away (for typos),
+# using a sorted vocabulary and a table of single-character deletions built at
+# index time, so a query never scans the documents themselves; it only touches
+# the posting arrays of the terms it expands to.
+#
+# The index holds document keys, not their text: the title and text of the
+# results of a query are read back through a loader, by default from the
+# current guide content (the memory-mapped knowledge base when one is
+# configured), so a worker process keeps no second copy of the corpus.
+#
+# When guide content is reloaded, updated() derives a new index that drops and
+# re-adds only the changed documents; the running index keeps serving queries
+# until it is swapped. Its tables are persistent layered maps (LayeredMap), so
+# the new index shares everything the change does not touch and an update
+# costs about the same on a small corpus as on a large one.
+#
+# A knowledge base carries the index of its content (store_items()), and
+# from_store() searches it in place: the tables are sorted tables over the
+# mapped file and the posting arrays are numpy views of it, so worker
+# processes share one copy through the page cache.
+
+FORMAT_VERSION = 3
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+MIN_PREFIX = 2
+MAX_EXPANSIONS = 32
+MIN_FUZZY = 4
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.5
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+
+Document = namedtuple("Document", ["key", "title", "text"])
+SearchResult = namedtuple("SearchResult", ["key", "title", "score", "snippet", "text"])
+
+
+def tokenize(text):
+    # Hyphenated terms ("ring-enhancing", "TI-RADS") are indexed whole and by part.
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if "-" in token:
+            tokens.extend(part for part in token.split("-") if part)
+    return tokens
+
+
+def deletions(term):
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def within_one_edit(a, b):
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diff = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        # Adjacent transposition.
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if len(a) > len(b):
+        a, b = b, a
+    return any(b[:i] + b[i + 1:] == a for i in range(len(b)))
+
+
+# Marks a removed key in the upper layers of a LayeredMap.
+DELETED = object()
+
+
+class LayeredMap:
+    # A persistent mapping for the copy-on-write updates of the index.
+    # updated() returns a new map that shares every layer of this one and
+    # adds one layer with the changes; the top two layers are folded together
+    # while the upper one is at least half the size of the one below (like
+    # the carries of a binary counter), so a lookup probes O(log n) layers and
+    # an entry is copied O(log n) times over any run of updates. Removed keys
+    # are kept as DELETED until their layer is folded into the bottom one.
+    # Every layer also keeps its keys sorted, for ordered scans.
+    #
+    # `base` is an optional read-only mapping below the layers (a StoredMap)
+    # that is never folded, so removed keys stay marked above it.
+    def __init__(self, data=(), base=None):
+        data = dict(data)
+        self.layers = [(data, sorted(data))]
+        self.base = base
+        self.size = len(data) + (len(base) if base is not None else 0)
+
+    def get(self, key, default=None):
+        for layer, _ in reversed(self.layers):
+            if key in layer:
+                value = layer[key]
+                return default if value is DELETED else value
+        if self.base is not None:
+            return self.base.get(key, default)
+        return default
+
+    def __getitem__(self, key):
+        value = self.get(key, DELETED)
+        if value is DELETED:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, DELETED) is not DELETED
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return self.keys_from("")
+
+    def keys_from(self, start):
+        # The keys from `start` on, in sorted order.
+        def run(keys):
+            for position in range(bisect.bisect_left(keys, start), len(keys)):
+                yield keys[position]
+
+        def live(key):
+            # The top layer holding the key decides; a key that only the
+            # base holds is live.
+            for layer, _ in reversed(self.layers):
+                if key in layer:
+                    return layer[key] is not DELETED
+            return True
+
+        previous = DELETED
+        runs = [run(keys) for _, keys in self.layers]
+        if self.base is not None:
+            runs.append(self.base.keys_from(start))
+        for key in heapq.merge(*runs):
+            if key != previous:
+                previous = key
+                if live(key):
+                    yield key
+
+    def items(self):
+        merged = dict(self.base.items()) if self.base is not None else {}
+        for layer, _ in self.layers:
+            merged.update(layer)
+        return [(key, value) for key, value in merged.items() if value is not DELETED]
+
+    def updated(self, changes):
+        # `changes` maps keys to their new values, or to DELETED; the map
+        # takes ownership of it.
+        if not changes:
+            return self
+        size = self.size
+        for key, value in changes.items():
+            size += (value is not DELETED) - (key in self)
+        layers = self.layers + [(changes, sorted(changes))]
+        while len(layers) > 1 and 2 * len(layers[-1][0]) >= len(layers[-2][0]):
+            upper, upper_keys = layers.pop()
+            lower, lower_keys = layers.pop()
+            merged = dict(lower)
+            merged.update(upper)
+            keys = list(dict.fromkeys(heapq.merge(lower_keys, upper_keys)))
+            if not layers and self.base is None:
+                merged = {key: value for key, value in merged.items() if value is not DELETED}
+                keys = [key for key in keys if key in merged]
+            layers.append((merged, keys))
+        result = LayeredMap(base=self.base)
+        result.layers = layers
+        result.size = size
+        return result
+
+
+class StoredMap:
+    # A read-only sorted mapping over a SortedTable of a knowledge base, with
+    # values decoded by `decode` from their bytes as they are read. Tuple
+    # keys are stored joined like the keys of the store.
+    def __init__(self, table, decode, tuple_keys=False):
+        self.table = table
+        self.decode = decode
+        self.tuple_keys = tuple_keys
+
+    def _encode(self, key):
+        return KEY_SEPARATOR.join(key) if self.tuple_keys else key
+
+    def _key(self, position):
+        key = self.table.key(position)
+        return tuple(key.split(KEY_SEPARATOR)) if self.tuple_keys else key
+
+    def get(self, key, default=None):
+        position = self.table.find(self._encode(key))
+        return default if position < 0 else self.decode(self.table.value(position))
+
+    def __contains__(self, key):
+        return self.table.find(self._encode(key)) >= 0
+
+    def __len__(self):
+        return len(self.table)
+
+    def keys_from(self, start):
+        for position in range(self.table.position(self._encode(start) if start else ""), len(self.table)):
+            yield self._key(position)
+
+    def items(self):
+        return [(self._key(position), self.decode(self.table.value(position))) for position in range(len(self.table))]
+
+
+class StoredKeys:
+    # Doc id -> document key of a stored index, read from its table of
+    # documents on access; keys appended by updated() are kept in memory.
+    def __init__(self, documents, order):
+        self.documents = documents
+        # Doc id -> position in `documents`, -1 for removed documents.
+        self.order = order
+        self.added = []
+
+    def __len__(self):
+        return len(self.order) + len(self.added)
+
+    def __getitem__(self, doc_id):
+        if doc_id >= len(self.order):
+            return self.added[doc_id - len(self.order)]
+        position = self.order[doc_id]
+        if position < 0:
+            return None
+        return tuple(self.documents.key(position).split(KEY_SEPARATOR))
+
+    def append(self, key):
+        self.added.append(key)
+
+
+def posting_arrays(counts):
+    # Postings are parallel (doc ids, term frequencies) arrays so that a
+    # query term is scored for all of its documents in one vectorized step.
+    ids = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+    frequencies = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    return ids, frequencies
+
+
+class SearchIndex:
+    def __init__(self, documents=(), loader=None):
+        # `loader` maps a document key to its current Document, or None if
+        # it is gone; it defaults to guide_document().
+        self.loader = loader or guide_document
+        # Doc id -> document key and token count. Both only grow and are
+        # shared with the indexes derived by updated(); an index searches
+        # the first `size` doc ids, of which those its postings hold are live.
+        self.keys = []
+        self.lengths = np.zeros(0, dtype=np.float32)
+        positions = {}
+        lengths = []
+        pending = {}
+        for document in documents:
+            doc_id = len(self.keys)
+            tokens = tokenize(document.title + "\n" + document.text)
+            self.keys.append(document.key)
+            positions[document.key] = doc_id
+            lengths.append(len(tokens))
+            for term, count in Counter(tokens).items():
+                pending.setdefault(term, {})[doc_id] = count
+        if lengths:
+            self.lengths = np.asarray(lengths, dtype=np.float32)
+        self._build(positions, {term: posting_arrays(counts) for term, counts in pending.items()})
+
+    def _build(self, positions, postings):
+        self.size = len(self.keys)
+        self.live = len(positions)
+        self.total_length = self.lengths[:self.size].sum()
+        deletes = {}
+        for term in sorted(postings):
+            if len(term) >= MIN_FUZZY:
+                for variant in deletions(term):
+                    deletes.setdefault(variant, []).append(term)
+        # Document key -> doc id.
+        self.positions = LayeredMap(positions)
+        # Term -> (doc ids, term frequencies).
+        self.postings = LayeredMap(postings)
+        # Single-character deletion -> the terms it comes from.
+        self.deletes = LayeredMap(deletes)
+
+    @property
+    def vocabulary(self):
+        return list(self.postings)
+
+    def updated(self, removed=(), added=()):
+        # Returns a new index without the `removed` documents and with the
+        # `added` ones. The index keeps no text, so `removed` are Documents
+        # with the content that was indexed, read before it was replaced.
+        # Only the entries for the terms of those documents are written, and
+        # this index is not modified.
+        index = SearchIndex(loader=self.loader)
+        index.keys = self.keys
+        index.lengths = self.lengths
+        index.live = self.live
+        index.total_length = self.total_length
+        positions = {}
+        postings = {}
+
+        def current(changes, table, key):
+            value = changes[key] if key in changes else table.get(key, DELETED)
+            return None if value is DELETED else value
+
+        for document in removed:
+            doc_id = current(positions, self.positions, document.key)
+            if doc_id is None:
+                continue
+            positions[document.key] = DELETED
+            for term in set(tokenize(document.title + "\n" + document.text)):
+                entry = current(postings, self.postings, term)
+                if entry is None:
+                    continue
+                ids, frequencies = entry
+                keep = ids != doc_id
+                postings[term] = (ids[keep], frequencies[keep]) if keep.any() else DELETED
+            index.live -= 1
+            index.total_length -= self.lengths[doc_id]
+        pending = {}
+        for document in added:
+            if current(positions, self.positions, document.key) is not None:
+                raise ValueError(f"Document {document.key!r} is already indexed")
+            doc_id = len(index.keys)
+            tokens = tokenize(document.title + "\n" + document.text)
+            index.keys.append(document.key)
+            if doc_id >= len(index.lengths):
+                grown = np.zeros(max(16, 2 * doc_id), dtype=np.float32)
+                grown[:len(index.lengths)] = index.lengths
+                index.lengths = grown
+            index.lengths[doc_id] = len(tokens)
+            positions[document.key] = doc_id
+            index.live += 1
+            index.total_length += len(tokens)
+            for term, count in Counter(tokens).items():
+                pending.setdefault(term, {})[doc_id] = count
+        for term, counts in pending.items():
+            ids, frequencies = posting_arrays(counts)
+            entry = current(postings, self.postings, term)
+            if entry is not None:
+                ids = np.concatenate((entry[0], ids))
+                frequencies = np.concatenate((entry[1], frequencies))
+            postings[term] = (ids, frequencies)
+
+        # Terms that appeared or disappeared change the deletion table; a
+        # term dropped with a removed document and brought back by an added
+        # one keeps its entries.
+        deletes = {}
+        for term, entry in postings.items():
+            present = entry is not DELETED
+            if len(term) < MIN_FUZZY or present == (term in self.postings):
+                continue
+            for variant in deletions(term):
+                terms = current(deletes, self.deletes, variant) or []
+                terms = terms + [term] if present else [other for other in terms if other != term]
+                deletes[variant] = terms or DELETED
+        index.size = len(index.keys)
+        index.positions = self.positions.updated(positions)
+        index.postings = self.postings.updated(postings)
+        index.deletes = self.deletes.updated(deletes)
+        return index
+
+    def __len__(self):
+        return self.live
+
+    # -------------------------------------------------------------------------
+    # Term expansion
+    # -------------------------------------------------------------------------
+    def prefixed(self, prefix):
+        terms = []
+        for term in self.postings.keys_from(prefix):
+            if not term.startswith(prefix) or len(terms) == MAX_EXPANSIONS:
+                break
+            terms.append(term)
+        return terms
+
+    def fuzzy(self, term):
+        candidates = set(self.deletes.get(term, ()))
+        if term in self.postings:
+            candidates.add(term)
+        for variant in deletions(term):
+            if variant in self.postings:
+                candidates.add(variant)
+            candidates.update(self.deletes.get(variant, ()))
+        return [candidate for candidate in candidates if within_one_edit(term, candidate)]
+
+    def expand(self, token):
+        # (term, weight) pairs a query token stands for.
+        if token in self.postings:
+            expanded = [(token, 1.0)]
+        else:
+            expanded = []
+        if len(token) >= MIN_PREFIX:
+            expanded.extend((term, PREFIX_WEIGHT) for term in self.prefixed(token) if term != token)
+        if not expanded and len(token) >= MIN_FUZZY:
+            expanded.extend((term, FUZZY_WEIGHT) for term in self.fuzzy(token))
+        return expanded
+
+    # -------------------------------------------------------------------------
+    # Querying
+    # -------------------------------------------------------------------------
+    def search(self, query, limit=10):
+        count = self.live
+        if not count:
+            return []
+        norms = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[:self.size] / (self.total_length / count))
+        scores = np.zeros(self.size, dtype=np.float32)
+        terms = set()
+        for token in set(tokenize(query)):
+            for term, weight in self.expand(token):
+                ids, frequencies = self.postings[term]
+                idf = math.log(1 + (count - len(ids) + 0.5) / (len(ids) + 0.5))
+                scores[ids] += weight * idf * frequencies * (BM25_K1 + 1) / (frequencies + norms[ids])
+                terms.add(term)
+        hits = np.flatnonzero(scores)
+        if len(hits) > limit:
+            hits = hits[np.argpartition(-scores[hits], limit - 1)[:limit]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        results = []
+        for doc_id in hits:
+            key = self.keys[doc_id]
+            # The content may be gone already while its removal is indexed.
+            document = self.loader(key)
+            if document is not None:
+                results.append(SearchResult(key, document.title, float(scores[doc_id]),
+                                            snippet(document.text, terms), document.text))
+        return results
+
+    # -------------------------------------------------------------------------
+    # Knowledge base
+    # -------------------------------------------------------------------------
+    def store_items(self):
+        # The (key, value) records of this index in a knowledge base:
+        #
+        #   ("search",)               {"version": FORMAT_VERSION} as JSON
+        #   ("search", "terms")       sorted table, term -> its posting arrays
+        #   ("search", "deletes")     sorted table, deletion -> int32 positions
+        #                             of its terms in ("search", "terms")
+        #   ("search", "documents")   sorted table, document key -> int32 doc id
+        #   ("search", "order")       int32 per doc id, its position in
+        #                             ("search", "documents"), -1 if removed
+        #   ("search", "lengths")     float32 token count per doc id
+        terms = list(self.postings)
+        term_positions = {term: position for position, term in enumerate(terms)}
+        documents = sorted((KEY_SEPARATOR.join(key), doc_id) for key, doc_id in self.positions.items())
+        order = np.full(self.size, -1, dtype="<i4")
+        lengths = np.zeros(self.size, dtype="<f4")
+        for position, (_, doc_id) in enumerate(documents):
+            order[doc_id] = position
+            lengths[doc_id] = self.lengths[doc_id]
+        yield ("search",), json.dumps({"version": FORMAT_VERSION})
+        yield ("search", "terms"), pack_table((term, posting_bytes(*self.postings[term])) for term in terms)
+        yield ("search", "deletes"), pack_table(
+            (variant, np.asarray([term_positions[term] for term in variant_terms], dtype="<i4").tobytes())
+            for variant, variant_terms in self.deletes.items())
+        yield ("search", "documents"), pack_table(
+            (key, doc_id.to_bytes(4, "little", signed=True)) for key, doc_id in documents)
+        yield ("search", "order"), order.tobytes()
+        yield ("search", "lengths"), lengths.tobytes()
+
+    @classmethod
+    def from_store(cls, store, loader=None):
+        # The index stored by store_items() in a knowledge base, searched in
+        # place; None if the store has none from this version. Entries
+        # changed by updated() are layered over the stored tables in memory.
+        version = store.get(("search",))
+        if version is None or json.loads(version).get("version") != FORMAT_VERSION:
+            return None
+        index = cls(loader=loader)
+        terms = SortedTable(store.view(("search", "terms")))
+        documents = SortedTable(store.view(("search", "documents")))
+        index.keys = StoredKeys(documents, np.frombuffer(store.view(("search", "order")), dtype="<i4"))
+        index.lengths = np.frombuffer(store.view(("search", "lengths")), dtype="<f4")
+        index.size = len(index.keys)
+        index.live = len(documents)
+        index.total_length = index.lengths.sum()
+        index.positions = LayeredMap(base=StoredMap(
+            documents, lambda value: int.from_bytes(value, "little", signed=True), tuple_keys=True))
+        index.postings = LayeredMap(base=StoredMap(terms, stored_postings))
+        index.deletes = LayeredMap(base=StoredMap(
+            SortedTable(store.view(("search", "deletes"))),
+            lambda value: [terms.key(position) for position in np.frombuffer(value, dtype="<i4").tolist()]))
+        return index
+
+    # -------------------------------------------------------------------------
+    # Serialization
+    # -------------------------------------------------------------------------
+    def save(self, path):
+        # Written as a knowledge base holding only the index records, so
+        # loading it executes nothing from the file and maps it like a store.
+        write_store(path, self.store_items())
+
+    @classmethod
+    def load(cls, path, loader=None):
+        index = cls.from_store(KnowledgeBase(path), loader)
+        if index is None:
+            raise ValueError(f"{path} was built by an incompatible version of the search index")
+        return index
+
+
+def posting_bytes(ids, frequencies):
+    return ids.astype("<i4").tobytes() + frequencies.astype("<f4").tobytes()
+
+
+def stored_postings(value):
+    # The (doc ids, term frequencies) arrays packed by posting_bytes(), as
+    # views of the mapped file.
+    count = len(value) // 8
+    return (np.frombuffer(value, dtype="<i4", count=count),
+            np.frombuffer(value, dtype="<f4", count=count, offset=4 * count))
+
+
+def snippet(text, terms, width=160):
+    for line in text.splitlines():
+        tokens = set(tokenize(line))
+        if tokens & terms:
+            line = line.strip().lstrip("-#* ")
+            return line if len(line) <= width else line[:width - 1] + "…"
+    return ""
+
+
+# =============================================================================
+# Guide Corpus
+# =============================================================================
+TOPIC_DOCUMENT_MODES = (("By Section", "Section"), ("By System", "System"))
+
+
+def topic_document(topic_mode, selection, block=None):
+    # `block` defaults to the current content of the topic.
+    from radiology_guide.guides import topic_block
+
+    heading = dict(TOPIC_DOCUMENT_MODES)[topic_mode]
+    if block is None:
+        block = topic_block(topic_mode, selection)
+    if block is None:
+        return None
+    return Document(("topic", topic_mode, selection), f"{heading}: {selection}", block)
+
+
+def lesion_document(rule):
+    from radiology_guide.guides import rule_body
+
+    return Document(("lesion", rule.id), rule.title, rule_body(rule))
+
+
+def guide_document(key):
+    # The current Document for an index key, or None if it no longer exists.
+    if key[0] == "topic":
+        return topic_document(*key[1:])
+    if key[0] == "lesion":
+        from radiology_guide.rules import default_engine
+
+        rule = default_engine().by_id.get(key[1])
+        return lesion_document(rule) if rule is not None else None
+    return None
+
+
+def guide_documents(rules=None, blocks=None):
+    # Every indexed topic block and lesion rule of the current content, or of
+    # `rules` and `blocks` ((topic_mode, selection) -> block) when given, as
+    # for a knowledge base that is being built.
+    from radiology_guide import options
+    from radiology_guide.rules import default_engine
+
+    for topic_mode, _ in TOPIC_DOCUMENT_MODES:
+        for selection in options.TOPIC_OPTIONS[topic_mode][1]:
+            if blocks is None:
+                document = topic_document(topic_mode, selection)
+            elif (topic_mode, selection) in blocks:
+                document = topic_document(topic_mode, selection, blocks[topic_mode, selection])
+            else:
+                document = None
+            if document is not None:
+                yield document
+    for rule in default_engine().rules if rules is None else rules:
+        yield lesion_document(rule)
+
+
+def build_index():
+    return SearchIndex(guide_documents())
+
+
+DEFAULT_INDEX_PATH = os.environ.get("RADIOLOGY_GUIDE_SEARCH_INDEX")
+
+
+def load_default_index():
+    # Loaded from a prebuilt index when RADIOLOGY_GUIDE_SEARCH_INDEX points at
+    # one, read from the configured knowledge base when it carries one, and
+    # otherwise built from the guide content.
+    from radiology_guide.kb import default_kb
+
+    if DEFAULT_INDEX_PATH and os.path.exists(DEFAULT_INDEX_PATH):
+        return SearchIndex.load(DEFAULT_INDEX_PATH)
+    kb = default_kb()
+    index = SearchIndex.from_store(kb) if kb is not None else None
+    return index if index is not None else build_index()
+
+
+default_index = ProcessDefault(load_default_index)
+
+
+# =============================================================================
+# Command Line
+# =============================================================================
+# python -m radiology_guide.search build index.kb
+# python -m radiology_guide.search query "ring enhancing"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m radiology_guide.search",
+                                     description="Build or query the guide search index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="build the index and write it to a file")
+    build_parser.add_argument("path")
+    query_parser = commands.add_parser("query", help="run a query against the index")
+    query_parser.add_argument("query")
+    query_parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="prebuilt index file")
+    query_parser.add_argument("-n", "--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        index = build_index()
+        index.save(args.path)
+        print(f"Indexed {len(index)} documents ({len(index.vocabulary)} terms) into {args.path}")
+    else:
+        index = SearchIndex.load(args.index) if args.index else build_index()
+        for result in index.search(args.query, args.limit):
+            print(f"{result.score:6.2f}  {result.title}\n        {result.snippet}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+import contextlib
+import os
+import threading
+
+# =============================================================================
+# Shared Helpers
+# =============================================================================
+
+
+class ProcessDefault:
+    # A value built on first use and shared by every caller in the process,
+    # such as the rule engine or the search index. Calling it returns the
+    # value. `value` stays None until then (or while the factory returns
+    # None), and hot reload assigns to it to swap in a new value; readers get
+    # either the old or the new one.
+    def __init__(self, factory):
+        self.factory = factory
+        self.value = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        value = self.value
+        if value is None:
+            with self._lock:
+                value = self.value
+                if value is None:
+                    value = self.value = self.factory()
+        return value
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="w"):
+    # Yields a handle on a temporary file next to `path` that replaces it in
+    # one step once the block completes, so a reader sees either the old or
+    # the new file and an interrupted write leaves the old one in place.
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, mode, encoding=None if "b" in mode else "utf-8") as handle:
+            yield handle
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,65 @@
+import io
+import json
+
+import pytest
+
+from radiology_guide import get_complete_lesion_guide, get_topic_guide
+from radiology_guide.batch import LESION_COLUMNS, main, run
+
+CASES = [
+    ("CT", "Brain", "Mass", "2 cm", "Irregular", "Round", "Solid", "None", "None", "", "Ring-enhancing",
+     "no edema"),
+    ("Ultrasound", "Thyroid", "Mass", "1 cm", "Smooth", "Oval", "Cystic", "Microcalcifications", "None", "", "",
+     ""),
+    ("MRI", "Liver", "Cyst", "", "", "", "", "", "", "", "", "hemorrhagic components, edema"),
+]
+
+
+def write_csv(path, columns, rows):
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write(",".join(columns) + "\n")
+        for row in rows:
+            handle.write(",".join(f'"{value}"' for value in row) + "\n")
+    return str(path)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_lesion_guides_match_the_app_in_input_order(tmp_path, workers):
+    path = write_csv(tmp_path / "cases.csv", LESION_COLUMNS, CASES * 200)
+    output = io.StringIO()
+
+    count, _ = run("lesions", path, output, workers=workers, chunksize=150)
+
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert count == len(records) == len(CASES) * 200
+    for number, record in enumerate(records):
+        case = CASES[number % len(CASES)]
+        assert record["row"] == number
+        assert record["modality"] == case[0]
+        assert record["guide"] == get_complete_lesion_guide(*case)
+
+
+def test_missing_optional_columns_render_as_empty(tmp_path):
+    path = write_csv(tmp_path / "cases.csv", ("modality", "organ", "lesion_type"), [("CT", "Brain", "Mass")])
+    output = io.StringIO()
+    run("lesions", path, output, workers=1)
+    guide = json.loads(output.getvalue())["guide"]
+    assert guide == get_complete_lesion_guide("CT", "Brain", "Mass", "", "", "", "", "", "", "", "", "")
+
+
+def test_missing_required_columns_are_reported(tmp_path):
+    path = write_csv(tmp_path / "cases.csv", ("modality", "organ"), [("CT", "Brain")])
+    with pytest.raises(ValueError, match="lesion_type"):
+        run("lesions", path, io.StringIO(), workers=1)
+
+
+def test_markdown_output_from_the_command_line(tmp_path):
+    path = write_csv(tmp_path / "topics.csv", ("topic_mode", "selection"),
+                     [("By Section", "Anatomy"), ("By System", "Breast")])
+    output = tmp_path / "guides.md"
+
+    assert main(["topics", path, "-o", str(output), "-j", "1"]) == 0
+
+    text = output.read_text(encoding="utf-8")
+    assert text == (f"<!-- row 0 -->\n{get_topic_guide('By Section', 'Anatomy')}\n"
+                    f"<!-- row 1 -->\n{get_topic_guide('By System', 'Breast')}\n")
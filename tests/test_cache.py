@@ -0,0 +1,72 @@
+import pytest
+
+from radiology_guide import get_topic_guide
+from radiology_guide.cache import RenderCache, memoize
+from radiology_guide.reload import key_matches
+from radiology_guide.rules import WILDCARD
+
+
+def test_invalidate_drops_only_matching_keys():
+    cache = RenderCache()
+    keys = [("CT", "Brain", "Mass", "2"), ("CT", "Liver", "Mass", "2"), ("MRI", "Brain", "Cyst", "1")]
+    for key in keys:
+        cache.put(key, "guide")
+
+    pattern = (WILDCARD, "Brain", WILDCARD)
+    assert cache.invalidate(lambda key: key_matches(pattern, key[:3])) == 2
+
+    assert cache.get(keys[1]) == "guide"
+    assert cache.get(keys[0]) is None and cache.get(keys[2]) is None
+    assert len(cache) == 1
+
+
+def test_put_after_invalidate_discards_stale_values():
+    cache = RenderCache()
+    generation = cache.generation
+    cache.invalidate(lambda key: True)
+    cache.put(("CT",), "rendered from old content", generation)
+    assert cache.get(("CT",)) is None
+
+
+def test_lru_eviction():
+    cache = RenderCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.stats()["evictions"] == 1
+
+
+def test_memoize_passes_the_arguments_unchanged():
+    calls = []
+
+    @memoize(RenderCache())
+    def render(text):
+        calls.append(text)
+        return f"- **Additional Features:** {text}"
+
+    assert render("no edema\nline2   x") == "- **Additional Features:** no edema\nline2   x"
+    assert render("no edema line2 x") == "- **Additional Features:** no edema line2 x"
+    assert render("no edema\nline2   x") == "- **Additional Features:** no edema\nline2   x"
+    assert calls == ["no edema\nline2   x", "no edema line2 x"]
+
+
+def test_memoize_binds_keyword_arguments():
+    calls = []
+
+    @memoize(RenderCache())
+    def render(topic_mode, selection="Anatomy"):
+        calls.append((topic_mode, selection))
+        return f"{topic_mode}: {selection}"
+
+    assert render(topic_mode="By Section", selection="Anatomy") == "By Section: Anatomy"
+    assert render("By Section", selection="Anatomy") == "By Section: Anatomy"
+    assert render("By Section") == "By Section: Anatomy"
+    assert render("By Section", "Anatomy") == "By Section: Anatomy"
+    assert calls == [("By Section", "Anatomy")]
+    with pytest.raises(TypeError):
+        render("By Section", section="Anatomy")
+
+
+def test_public_guides_accept_keyword_arguments():
+    assert get_topic_guide(topic_mode="By Section", selection="Anatomy") == get_topic_guide("By Section", "Anatomy")
@@ -0,0 +1,58 @@
+import json
+
+from radiology_guide import get_topic_guide
+from radiology_guide.export import MANIFEST_NAME, SEARCH_NAME, export, main, markdown_to_html, pages, plain_text
+
+
+def read_manifest(output):
+    return json.loads((output / MANIFEST_NAME).read_text(encoding="utf-8"))
+
+
+def test_markdown_to_html():
+    markdown = "## Title **bold**\n\n- one\n- [link](https://example.org)\n1. first\nA & B\n---\n"
+    assert markdown_to_html(markdown) == (
+        "<h2>Title <strong>bold</strong></h2>\n"
+        "<ul>\n<li>one</li>\n<li><a href=\"https://example.org\">link</a></li>\n</ul>\n"
+        "<ol>\n<li>first</li>\n</ol>\n"
+        "<p>A &amp; B</p>\n"
+        "<hr>\n"
+    )
+    assert plain_text(markdown) == "Title bold one link 1. first A & B"
+
+
+def test_export_writes_every_page_and_skips_unchanged_ones(tmp_path):
+    all_pages = list(pages())
+
+    assert export(str(tmp_path), workers=1) == (len(all_pages), 0, 0)
+
+    topic = next(page for page in all_pages if page.kind == "topic")
+    assert (tmp_path / (topic.path + ".md")).read_text(encoding="utf-8") == get_topic_guide(*topic.key)
+    assert "<h" in (tmp_path / (topic.path + ".html")).read_text(encoding="utf-8")
+    assert len(json.loads((tmp_path / SEARCH_NAME).read_text(encoding="utf-8"))) == len(all_pages)
+    assert export(str(tmp_path), workers=1) == (0, len(all_pages), 0)
+
+    # A changed fingerprint or a missing page is rendered again.
+    manifest = read_manifest(tmp_path)
+    manifest["pages"][topic.path] = "changed"
+    (tmp_path / MANIFEST_NAME).write_text(json.dumps(manifest), encoding="utf-8")
+    (tmp_path / (all_pages[-1].path + ".html")).unlink()
+    assert export(str(tmp_path), workers=1) == (2, len(all_pages) - 2, 0)
+    assert (tmp_path / (all_pages[-1].path + ".html")).exists()
+
+
+def test_force_still_removes_pages_that_no_longer_exist(tmp_path, capsys):
+    export(str(tmp_path), workers=1)
+    manifest = read_manifest(tmp_path)
+    manifest["pages"]["topics/old/page"] = "removed"
+    (tmp_path / MANIFEST_NAME).write_text(json.dumps(manifest), encoding="utf-8")
+    for extension in (".md", ".html"):
+        (tmp_path / "topics" / "old").mkdir(exist_ok=True)
+        (tmp_path / "topics" / "old" / ("page" + extension)).write_text("stale", encoding="utf-8")
+
+    assert main([str(tmp_path), "--force", "-j", "1"]) == 0
+
+    assert f"Rendered {len(list(pages()))} pages (0 unchanged, 1 removed)" in capsys.readouterr().err
+
+    assert not (tmp_path / "topics" / "old" / "page.md").exists()
+    assert not (tmp_path / "topics" / "old" / "page.html").exists()
+    assert "topics/old/page" not in read_manifest(tmp_path)["pages"]
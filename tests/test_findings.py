@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from radiology_guide.findings import load_lexicon, main
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return load_lexicon()
+
+
+@pytest.mark.parametrize("text, present, absent", [
+    ("diffusion restriction, no edema, hemorrhagic components", {"diffusion restriction", "hemorrhage"}, {"edema"}),
+    ("edema absent, hemorrhage present", {"hemorrhage"}, {"edema"}),
+    ("hemorrhage, edema absent", {"hemorrhage"}, {"edema"}),
+    ("edema, no hemorrhage", {"edema"}, {"hemorrhage"}),
+    ("no edema or hemorrhage", set(), {"edema", "hemorrhage"}),
+    ("neither edema nor hemorrhage", set(), {"edema", "hemorrhage"}),
+    ("no edema but hemorrhage", {"hemorrhage"}, {"edema"}),
+    ("edema and hemorrhage not seen", set(), {"edema", "hemorrhage"}),
+])
+def test_negation_scope(extractor, text, present, absent):
+    assert extractor.summarize(text) == (present, absent)
+
+
+def test_dual_trigger_applies_in_one_direction(extractor):
+    # "absent" is a trigger on either side; it reaches forward only when
+    # nothing before it is negated.
+    assert extractor.summarize("absent edema") == (set(), {"edema"})
+    assert extractor.summarize("edema absent hemorrhage") == ({"hemorrhage"}, {"edema"})
+
+
+def test_batch_from_the_command_line(tmp_path, capsys):
+    reports = tmp_path / "reports.txt"
+    reports.write_text("restricted diffusion, no edema\nunremarkable\n", encoding="utf-8")
+    output = tmp_path / "findings.jsonl"
+
+    assert main(["batch", str(reports), "-o", str(output), "-j", "1"]) == 0
+
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert [(record["present"], record["absent"]) for record in records] == [
+        (["diffusion restriction"], ["edema"]), ([], [])]
+    assert "2 rows in" in capsys.readouterr().err
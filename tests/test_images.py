@@ -0,0 +1,87 @@
+import io
+import json
+import os
+
+from PIL import Image
+
+from radiology_guide.images import THUMBNAIL_WIDTHS, ImageStore, source_name
+
+
+def encoded(color, size=(800, 600), fmt="JPEG"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def open_store(tmp_path, **options):
+    return ImageStore(str(tmp_path / "store"), allow_fetch=False, **options)
+
+
+def test_source_name_strips_the_thumbnail_prefix():
+    url = "https://upload.wikimedia.org/wikipedia/commons/thumb/8/8f/Gray1124.png/640px-Gray1124.png"
+    assert source_name(url) == "Gray1124.png"
+    assert source_name("/images/Gray1124.png") == "Gray1124.png"
+
+
+def test_add_writes_thumbnails_that_get_reads_back(tmp_path):
+    store = open_store(tmp_path)
+    digest = store.add("brain.jpg", encoded("red"))
+
+    for width in THUMBNAIL_WIDTHS:
+        assert Image.open(io.BytesIO(store.get("brain.jpg", width))).width == width
+    assert store.images[digest]["ext"] == "jpg"
+    assert open_store(tmp_path).get("brain.jpg", 160) == store.get("brain.jpg", 160)
+    assert store.get("missing.jpg") is None
+
+
+def test_image_for_does_not_block_on_a_missing_image(tmp_path):
+    store = open_store(tmp_path)
+    assert store.image_for("https://example.org/640px-missing.jpg") is None
+    assert not store._fetching
+
+
+def test_get_treats_a_trimmed_image_as_missing(tmp_path):
+    store = open_store(tmp_path)
+    digest = store.add("brain.jpg", encoded("red"))
+    # What a concurrent trim leaves behind between the two lookups in get().
+    del store.images[digest]
+    assert store.get("brain.jpg") is None
+
+
+def test_import_directory_skips_files_that_do_not_decode(tmp_path, caplog):
+    directory = tmp_path / "incoming"
+    directory.mkdir()
+    (directory / "bad.jpg").write_bytes(b"not an image")
+    (directory / "good.png").write_bytes(encoded("blue", fmt="PNG"))
+    (directory / "notes.txt").write_text("ignored")
+
+    store = open_store(tmp_path)
+    assert store.import_directory(str(directory)) == 1
+    assert set(store.sources) == {"good.png"}
+    assert "bad.jpg" in caplog.text
+
+
+def test_stores_of_two_processes_keep_each_others_images(tmp_path):
+    first, second = open_store(tmp_path), open_store(tmp_path)
+    first.add("brain.jpg", encoded("red"))
+    second.add("thyroid.jpg", encoded("green"))
+    first.add("breast.jpg", encoded("blue"))
+
+    with open(tmp_path / "store" / "manifest.json", encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    assert set(manifest["sources"]) == {"brain.jpg", "thyroid.jpg", "breast.jpg"}
+    assert first.get("thyroid.jpg") is not None
+
+
+def test_trim_drops_the_least_recently_used_images(tmp_path):
+    store = open_store(tmp_path)
+    red = store.add("red.jpg", encoded("red"))
+    for width in THUMBNAIL_WIDTHS:
+        os.utime(store._path(red, width), (1, 1))
+    size = store.images[red]["bytes"]
+    store.max_disk_bytes = size * 5 // 2
+
+    store.add("green.jpg", encoded("green", size=(801, 600)))
+    store.add("blue.jpg", encoded("blue", size=(802, 600)))
+    assert "red.jpg" not in store.sources and store.get("red.jpg") is None
+    assert set(store.sources) == {"green.jpg", "blue.jpg"}
@@ -0,0 +1,104 @@
+import pytest
+
+from radiology_guide.kb import KnowledgeBase, SortedTable, build, changed_keys, pack_table, write_store
+from radiology_guide.rules import RuleEngine, load_rules
+from radiology_guide.search import SearchIndex, build_index
+
+ITEMS = {
+    ("topic", "By Section", "Anatomy"): "**Anatomy in Radiology:**\n- Normal variants.\n",
+    ("topic-fallback", "By Section"): "No content yet.\n",
+    ("lesion", "ct-brain-mass"): "### CT Brain Mass\n\nRing-enhancing lesion — ödema.\n",
+    ("rules",): "[]",
+}
+
+
+def open_store(tmp_path, name, items):
+    path = str(tmp_path / name)
+    assert write_store(path, items.items()) == len(items)
+    return KnowledgeBase(path)
+
+
+def test_round_trip(tmp_path):
+    store = open_store(tmp_path, "guide.kb", ITEMS)
+    try:
+        assert len(store) == len(ITEMS)
+        for key, value in ITEMS.items():
+            assert store.get(key) == value
+            assert bytes(store.view(key)) == value.encode("utf-8")
+            assert key in store
+        assert store.get(("lesion", "missing")) is None
+        assert ("lesion", "missing") not in store
+        assert {key: str(value, "utf-8") for key, value in store.items()} == ITEMS
+    finally:
+        store.close()
+
+
+def test_views_stay_valid_after_close(tmp_path):
+    store = open_store(tmp_path, "guide.kb", ITEMS)
+    view = store.view(("lesion", "ct-brain-mass"))
+    store.close()
+    assert bytes(view) == ITEMS[("lesion", "ct-brain-mass")].encode("utf-8")
+
+
+def test_sorted_table(tmp_path):
+    items = {"edema": b"\x01\x00\x00\x00", "ödema": b"", "calcification": b"xyz", "cal": b"ab"}
+    store = open_store(tmp_path, "table.kb", {("table",): pack_table(items.items())})
+    table = SortedTable(store.view(("table",)))
+
+    assert [table.key(position) for position in range(len(table))] == sorted(items)
+    assert {key: bytes(table.get(key)) for key in items} == items
+    assert table.get("missing") is None and table.find("calc") == -1
+    assert table.key(table.position("calc")) == "calcification"
+    assert table.key(table.position("zzz")) == "ödema" and table.position("ü") == len(table)
+
+
+def test_empty_store(tmp_path):
+    store = open_store(tmp_path, "empty.kb", {})
+    assert len(store) == 0 and store.get(("rules",)) is None
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.kb"
+    path.write_bytes(b"not a knowledge base")
+    with pytest.raises(ValueError):
+        KnowledgeBase(str(path))
+
+
+def test_changed_keys(tmp_path):
+    old = open_store(tmp_path, "old.kb", ITEMS)
+    items = dict(ITEMS)
+    items[("topic", "By Section", "Anatomy")] = "Rewritten.\n"
+    del items[("topic-fallback", "By Section")]
+    items[("lesion", "us-thyroid")] = "### Thyroid Nodule\n"
+    new = open_store(tmp_path, "new.kb", items)
+
+    assert changed_keys(old, new) == {
+        ("topic", "By Section", "Anatomy"), ("topic-fallback", "By Section"), ("lesion", "us-thyroid"),
+    }
+    assert changed_keys(old, old) == set()
+    assert changed_keys(open_store(tmp_path, "empty.kb", {}), new) == set(items)
+
+
+def test_built_store_matches_the_bundled_content(tmp_path):
+    path = str(tmp_path / "guide.kb")
+    build(path)
+    store = KnowledgeBase(path)
+    bundled, stored = load_rules(), RuleEngine.from_store(store)
+
+    assert len(stored) == len(bundled) and [rule.id for rule in stored.rules] == [rule.id for rule in bundled.rules]
+    for rule in bundled.rules:
+        copy = stored.by_id[rule.id]
+        assert (copy.key, copy.priority, copy.conditions, copy.title, copy.body) == (
+            rule.key, rule.priority, rule.conditions, rule.title, rule.body)
+        assert stored.resolve(*rule.key).id == bundled.resolve(*rule.key).id
+
+    index = SearchIndex.from_store(store)
+    expected = build_index()
+    assert index.vocabulary == expected.vocabulary and len(index) == len(expected)
+    for query in ("ring enhancing", "calcif", "thyriod", "birads"):
+        assert ([(result.key, result.score) for result in index.search(query)]
+                == [(result.key, result.score) for result in expected.search(query)])
+
+    removed = index.updated([expected.loader(("lesion", bundled.rules[0].id))])
+    assert len(removed) == len(index) - 1
+    assert bundled.rules[0].id not in [result.key[1] for result in removed.search(bundled.rules[0].title)]
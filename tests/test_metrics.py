@@ -0,0 +1,91 @@
+import json
+import logging
+import socket
+
+import pytest
+
+from radiology_guide import metrics
+
+
+@pytest.fixture
+def recording(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    trace_log = logging.getLogger("radiology_guide.trace")
+    handlers = trace_log.handlers[:]
+    trace_log.handlers.clear()
+    exporter = metrics.Exporter(str(tmp_path), port=None)
+    monkeypatch.setattr(metrics.exporter, "value", exporter)
+    metrics.reset()
+    yield exporter
+    metrics.reset()
+    for handler in trace_log.handlers:
+        handler.close()
+    trace_log.handlers[:] = handlers
+
+
+def histogram(name, **labels):
+    return metrics._histograms[(name, tuple(sorted(labels.items())))]
+
+
+def test_histogram_buckets_are_upper_bounds():
+    histogram = metrics.Histogram((1, 10))
+    for value in (0.5, 1, 5, 10, 11):
+        histogram.observe(value)
+    assert histogram.counts == [2, 2, 1]
+    assert histogram.count == 5 and histogram.total == 27.5
+
+
+def test_disabled_calls_record_nothing(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    metrics.reset()
+    assert metrics.span("render") is metrics.NULL_SPAN
+    assert metrics.rerun("script") is metrics.NULL_SPAN
+    metrics.record_size("guide", "text")
+    assert metrics._histograms == {}
+
+
+def test_rerun_records_spans_labels_and_a_trace_line(recording, tmp_path):
+    with metrics.rerun("script"):
+        metrics.label(modality="CT")
+        with metrics.span("render"):
+            pass
+        # A fragment run inside a full rerun is recorded as one of its spans.
+        with metrics.rerun("fragment"):
+            pass
+        metrics.record_size("guide", "ödema")
+
+    assert histogram("radiology_guide_rerun_seconds", kind="script", modality="CT").count == 1
+    assert histogram("radiology_guide_phase_seconds", phase="render", modality="CT").count == 1
+    assert histogram("radiology_guide_phase_seconds", phase="fragment", modality="CT").count == 1
+    assert histogram("radiology_guide_payload_bytes", payload="guide", modality="CT").total == 6
+    for handler in logging.getLogger("radiology_guide.trace").handlers:
+        handler.flush()
+    [line] = (tmp_path / "trace.jsonl").read_text(encoding="utf-8").splitlines()
+    trace = json.loads(line)
+    assert trace["kind"] == "script" and trace["labels"] == {"modality": "CT"}
+    assert [span["name"] for span in trace["spans"]] == ["render", "fragment"]
+    assert trace["bytes"] == {"guide": 6}
+
+
+def test_prometheus_text_is_cumulative(recording, tmp_path):
+    with metrics.span("render"):
+        pass
+    text = metrics.prometheus_text()
+    lines = text.splitlines()
+
+    assert lines[0] == "# TYPE radiology_guide_phase_seconds histogram"
+    assert 'radiology_guide_phase_seconds_bucket{phase="render",le="+Inf"} 1' in lines
+    assert 'radiology_guide_phase_seconds_count{phase="render"} 1' in lines
+    assert "# TYPE radiology_guide_render_cache_hits_total counter" in lines
+    recording.maybe_export()
+    assert (tmp_path / "metrics.prom").read_text(encoding="utf-8") == text
+
+
+def test_exporter_falls_back_to_files_when_the_port_is_taken(recording, tmp_path, caplog):
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        with caplog.at_level(logging.WARNING, logger="radiology_guide.metrics"):
+            exporter = metrics.Exporter(str(tmp_path), port=str(taken.getsockname()[1]))
+    assert exporter.server is None
+    assert "Metrics endpoint not started" in caplog.text
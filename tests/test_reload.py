@@ -0,0 +1,80 @@
+import json
+
+from radiology_guide import findings, kb, rules, search
+from radiology_guide.guides import get_complete_lesion_guide, lesion_guide_cache
+from radiology_guide.reload import FindingsSource, KnowledgeBaseSource
+from radiology_guide.util import ProcessDefault
+
+CASE = ("CT", "Brain", "Mass", "", "", "", "", "", "", "", "")
+
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(data, handle)
+    return str(path)
+
+
+def test_changed_terms():
+    old = {"findings": {"edema": ["oedema"], "calcification": ["calcified"]},
+           "negations": {"before": ["no", "absent"], "after": []}, "terminators": ["but"]}
+    new = {"findings": {"edema": ["oedema", "swelling"], "calcification": ["calcified"], "cyst": []},
+           "negations": {"before": ["no"], "after": ["absent"]}, "terminators": ["but"]}
+    assert findings.changed_terms(old, new) == {"edema", "oedema", "swelling", "cyst", "absent"}
+    assert findings.changed_terms(old, old) == set()
+
+
+def test_findings_reload_invalidates_only_texts_that_mention_a_changed_term(tmp_path, monkeypatch):
+    lexicon = findings.read_lexicon()
+    path = write_json(tmp_path / "findings.json", lexicon)
+    source = FindingsSource(path)
+    monkeypatch.setattr(findings.default_extractor, "value", findings.default_extractor())
+    lesion_guide_cache.clear()
+    get_complete_lesion_guide(*CASE, "swelling")
+    get_complete_lesion_guide(*CASE, "hemorrhagic components")
+
+    lexicon["findings"]["edema"] = lexicon["findings"]["edema"] + ["swelling"]
+    write_json(path, lexicon)
+
+    assert source.reload().endswith(", 1 cached guides invalidated")
+    assert lesion_guide_cache.get(CASE + ("swelling",)) is None
+    assert lesion_guide_cache.get(CASE + ("hemorrhagic components",)) is not None
+    assert "Present: edema" in get_complete_lesion_guide(*CASE, "swelling")
+
+
+def test_knowledge_base_reload_swaps_the_engine_before_the_store(tmp_path, monkeypatch):
+    specs = rules.read_rule_specs(rules.DEFAULT_RULES_PATH)
+    rules_path = write_json(tmp_path / "rules.json", specs)
+    path = str(tmp_path / "guide.kb")
+    kb.build(path, rules_path)
+    store = kb.KnowledgeBase(path)
+    engine = rules.RuleEngine.from_store(store)
+
+    # The engine that is live at the moment each store is swapped in.
+    live_engines = []
+
+    class SwapRecorder(ProcessDefault):
+        def __setattr__(self, name, value):
+            if name == "value" and value is not None:
+                live_engines.append(rules.default_engine.value)
+            super().__setattr__(name, value)
+
+    recorder = SwapRecorder(lambda: None)
+    recorder.value = store
+    monkeypatch.setattr(kb, "default_kb", recorder)
+    monkeypatch.setattr(rules.default_engine, "value", engine)
+    monkeypatch.setattr(search.default_index, "value", search.SearchIndex.from_store(store))
+    lesion_guide_cache.clear()
+    removed = next(spec for spec in specs if spec["id"] == "ct-brain-mass")
+    old_guide = get_complete_lesion_guide(*CASE, "")
+    source = KnowledgeBaseSource(path)
+
+    write_json(rules_path, [spec for spec in specs if spec is not removed])
+    kb.build(path, rules_path)
+    live_engines.clear()
+    source.reload()
+
+    assert "ct-brain-mass" not in live_engines[0].by_id
+    # A rerun still resolving with the old engine renders the old body.
+    assert engine.resolve(*CASE[:3]).body in old_guide
+    assert "ct-brain-mass" not in [result.key[1] for result in search.default_index().search(removed["title"])]
+    assert get_complete_lesion_guide(*CASE, "") != old_guide
@@ -0,0 +1,33 @@
+from radiology_guide.rules import RuleEngine
+
+SPECS = [
+    {"id": "ct-brain", "modality": "CT", "organ": "Brain", "lesion_type": "Mass", "title": "CT Brain Mass"},
+    {"id": "ct-brain-ring", "modality": "CT", "organ": "Brain", "lesion_type": "Mass",
+     "when": {"enhancement": ["Ring-enhancing"]}, "title": "Ring-enhancing Brain Mass"},
+    {"id": "us-thyroid", "modality": "Ultrasound", "organ": "Thyroid", "lesion_type": "Mass",
+     "title": "Thyroid Nodule"},
+    {"id": "general", "title": "General Lesion Analysis"},
+]
+
+
+def test_resolve_prefers_the_most_specific_rule():
+    engine = RuleEngine(SPECS)
+    assert engine.resolve("CT", "Brain", "Mass", enhancement="Ring-enhancing").id == "ct-brain-ring"
+    assert engine.resolve("CT", "Brain", "Mass", enhancement="None").id == "ct-brain"
+    assert engine.resolve("MRI", "Liver", "Cyst").id == "general"
+
+
+def test_updated_leaves_the_old_engine_unchanged():
+    engine = RuleEngine(SPECS)
+    rules, index, by_id = list(engine.rules), {key: list(bucket) for key, bucket in engine.index.items()}, dict(engine.by_id)
+
+    changed = dict(SPECS[1], title="Ring-enhancing Lesion")
+    new = engine.updated(["ct-brain-ring", "us-thyroid"], [changed])
+
+    assert engine.rules == rules
+    assert {key: list(bucket) for key, bucket in engine.index.items()} == index
+    assert engine.by_id == by_id
+    assert engine.resolve("Ultrasound", "Thyroid", "Mass").id == "us-thyroid"
+    assert new.resolve("Ultrasound", "Thyroid", "Mass").id == "general"
+    assert new.resolve("CT", "Brain", "Mass", enhancement="Ring-enhancing").title == "Ring-enhancing Lesion"
+    assert "us-thyroid" not in new.by_id
@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+import pytest
+
+from radiology_guide.scoring import FEATURE_FIELDS, DifferentialScorer, load_differentials
+
+DIAGNOSES = [
+    {"name": "Glioblastoma", "organs": ["Brain"], "lesion_types": ["Mass"],
+     "features": {"enhancement:Ring-enhancing": 2.0, "margin:Irregular": 1.0, "finding:edema": 1.0}},
+    {"name": "Abscess", "organs": ["Brain"], "lesion_types": ["Mass"],
+     "features": {"enhancement:Ring-enhancing": 1.5, "finding:diffusion restriction": 2.0, "absent:edema": -0.5}},
+    {"name": "Papillary carcinoma", "organs": ["Thyroid"], "lesion_types": ["Mass"],
+     "features": {"calcification:Microcalcifications": 2.5}},
+    {"name": "Metastasis", "lesion_types": ["Mass"], "features": {"margin:Irregular": 0.5}},
+]
+
+
+def random_cases(scorer, count, seed=0):
+    rng = random.Random(seed)
+    values = {}
+    for feature in scorer.features:
+        field, _, value = feature.partition(":")
+        values.setdefault(field, []).append(value)
+    cases = []
+    for _ in range(count):
+        case = {field: rng.choice(values[field] + [""]) for field in FEATURE_FIELDS if field in values}
+        for field in ("finding", "absent"):
+            if field in values:
+                case[field] = frozenset(rng.sample(values[field], rng.randint(0, min(2, len(values[field])))))
+        cases.append(case)
+    return cases
+
+
+def test_rank_orders_by_score_and_masks_other_organs():
+    scorer = DifferentialScorer(DIAGNOSES)
+    ranked = scorer.rank({"organ": "Brain", "lesion_type": "Mass", "enhancement": "Ring-enhancing",
+                          "margin": "Irregular", "finding": frozenset({"edema"})})
+
+    assert [differential.name for differential in ranked] == ["Glioblastoma", "Abscess", "Metastasis"]
+    assert ranked[0].score == pytest.approx(5.0)
+    assert ranked[0].contributions[0] == ("enhancement:Ring-enhancing", 2.0)
+    assert "Papillary carcinoma" not in [differential.name for differential in ranked]
+
+
+def test_unknown_feature_field_is_rejected():
+    with pytest.raises(ValueError, match="unknown feature"):
+        DifferentialScorer([{"name": "Typo", "features": {"margn:Irregular": 1.0}}])
+
+
+@pytest.mark.parametrize("scorer", [DifferentialScorer(DIAGNOSES), load_differentials()], ids=["synthetic", "bundled"])
+def test_single_and_batch_scores_match(scorer):
+    cases = random_cases(scorer, 300)
+    batch_scores, X = scorer.score_batch(cases)
+    for row, case in enumerate(cases):
+        scores, active = scorer.score(case)
+        np.testing.assert_allclose(scores, batch_scores[row], rtol=1e-6)
+        np.testing.assert_array_equal(np.flatnonzero(X[row]), sorted(active))
+        # The column sums equal the matrix-vector product.
+        finite = np.isfinite(scores)
+        np.testing.assert_allclose(scores[finite], (scorer.weights @ scorer.encode(case))[finite], rtol=1e-6)
+    assert scorer.rank_batch(cases, k=3) == [scorer.rank(case, k=3) for case in cases]
@@ -0,0 +1,102 @@
+import pickle
+
+import pytest
+
+from radiology_guide.search import DELETED, Document, LayeredMap, SearchIndex, deletions
+
+DOCUMENTS = [
+    Document(("topic", "a"), "Ring enhancement", "Ring-enhancing lesions with surrounding edema."),
+    Document(("topic", "b"), "Thyroid", "Thyroid nodule scored with TI-RADS."),
+    Document(("topic", "c"), "Calcification", "Popcorn calcification in a fibroadenoma."),
+]
+
+
+def make_index(documents):
+    content = {document.key: document for document in documents}
+    return SearchIndex(documents, loader=content.get), content
+
+
+def snapshot(index):
+    return (index.vocabulary, sorted((variant, sorted(terms)) for variant, terms in index.deletes.items()),
+            len(index), [result.key for result in index.search("thyroid")])
+
+
+def test_search_ranks_prefix_and_typo_matches():
+    index, _ = make_index(DOCUMENTS)
+    assert [result.key for result in index.search("ring-enhancing")][0] == ("topic", "a")
+    assert [result.key for result in index.search("calcif")] == [("topic", "c")]
+    assert [result.key for result in index.search("thyriod")] == [("topic", "b")]
+
+
+def test_updated_leaves_the_old_index_unchanged():
+    index, content = make_index(DOCUMENTS)
+    before = snapshot(index)
+    replacement = Document(("topic", "b"), "Thyroid", "Parathyroid adenoma.")
+
+    new = index.updated([DOCUMENTS[1]], [replacement])
+
+    assert snapshot(index) == before
+    assert index.positions[("topic", "b")] == 1
+    content[replacement.key] = replacement
+    assert [result.key for result in new.search("adenoma")] == [("topic", "b")]
+    assert new.search("nodule") == []
+
+
+def test_removed_term_leaves_and_readded_term_returns():
+    index, _ = make_index(DOCUMENTS)
+    popcorn = deletions("popcorn")
+
+    removed = index.updated([DOCUMENTS[2]])
+    assert "popcorn" not in removed.vocabulary
+    assert "popcorn" not in removed.postings
+    assert all("popcorn" not in removed.deletes.get(variant, ()) for variant in popcorn)
+    assert removed.search("popcorn") == []
+
+    readded = removed.updated([], [DOCUMENTS[2]])
+    assert readded.vocabulary == index.vocabulary
+    assert all("popcorn" in readded.deletes.get(variant, ()) for variant in popcorn)
+    assert [result.key for result in readded.search("popcrn")] == [("topic", "c")]
+
+
+def test_remove_and_readd_in_one_update_keeps_the_term():
+    index, _ = make_index(DOCUMENTS)
+    new = index.updated([DOCUMENTS[2]], [DOCUMENTS[2]])
+    assert snapshot(new) == snapshot(index)
+    assert [result.key for result in new.search("popcorn")] == [("topic", "c")]
+
+
+def test_updated_rejects_a_document_that_is_already_indexed():
+    index, _ = make_index(DOCUMENTS)
+    with pytest.raises(ValueError):
+        index.updated([], [DOCUMENTS[0]])
+
+
+def test_save_and_load_after_updates(tmp_path):
+    index, content = make_index(DOCUMENTS)
+    index = index.updated([DOCUMENTS[0]])
+    path = str(tmp_path / "index.kb")
+    index.save(path)
+
+    loaded = SearchIndex.load(path, loader=content.get)
+    assert snapshot(loaded) == snapshot(index)
+    assert loaded.search("edema") == []
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "index.pkl"
+    path.write_bytes(pickle.dumps({"version": 3}))
+    with pytest.raises(ValueError):
+        SearchIndex.load(str(path))
+
+
+def test_layered_map_shares_layers_and_folds_them():
+    base = LayeredMap({f"k{number:03d}": number for number in range(100)})
+    current = base
+    for number in range(100, 160):
+        current = current.updated({f"k{number:03d}": number, f"k{number - 100:03d}": DELETED})
+
+    assert len(base) == 100 and "k000" in base and "k150" not in base
+    assert len(current) == 100 and "k000" not in current and current["k150"] == 150
+    assert list(current) == sorted(f"k{number:03d}" for number in range(60, 160))
+    assert list(current.keys_from("k15"))[:2] == ["k150", "k151"]
+    assert len(current.layers) <= 8